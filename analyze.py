@@ -0,0 +1,263 @@
+"""
+Analyse a stream of positions and print the outcome and best move of each.
+
+Each input line is a position: a subtract square value (e.g. `100`) or the
+four chopsticks hands in current_value order (e.g. `1 1 2 3` or
+`[1, 1, 2, 3]`), optionally followed by the player to move (`p1`, the
+default, or `p2`). Each output line is a JSON object with the input, the
+outcome for the player to move (win, loss, draw, or unknown for subtract
+square values beyond the table that the search could not prove) and the
+best move, in the order of the input, e.g.
+    python analyze.py positions.txt --workers 4 > analysis.jsonl
+
+Lines are read and answered a chunk at a time across worker processes,
+with only a few chunks in flight, so memory does not grow with the input.
+Each worker solves its tables once and answers every line from them.
+"""
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+from typing import Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import argparse
+import json
+import os
+import sys
+from games import cs_pack
+from solvers import WIN, DRAW, LOSS, SS_TABLE_LIMIT
+from solvers import ss_is_winning, ss_best_move, ss_quick_limit, ss_table
+from solvers import solve_chopsticks, use_tablebase
+from negamax import LRUCache, SSNegamax
+
+# Lines sent to a worker at a time.
+CHUNK_SIZE = 10000
+
+# Chunks waiting or being answered for each worker.
+CHUNKS_PER_WORKER = 2
+
+# Outcomes as they are written out.
+OUTCOME_NAMES = {WIN: 'win', DRAW: 'draw', LOSS: 'loss'}
+
+# Answers each worker remembers, since logs repeat positions.
+ANSWER_CACHE_ENTRIES = 100000
+
+# Brackets and commas allowed around the numbers of a line.
+_SEPARATORS = str.maketrans('[](),', '     ')
+
+# The search for subtract square values beyond the table, made once in
+# each worker by start_worker.
+_negamax: Optional[SSNegamax] = None
+
+# The outcome and best move of recently answered positions, by game and
+# value.
+_answers = LRUCache(ANSWER_CACHE_ENTRIES)
+
+
+def start_worker(ss_limit: int = 0,
+                 tablebase: Optional[str] = None) -> None:
+    """
+    Solve the tables used by analyze_line once, before any line: chopsticks,
+    and subtract square up to ss_limit, or from the tablebase file if one
+    is given (which every worker then shares through the page cache).
+    """
+
+    global _negamax
+
+    if tablebase is not None:
+        use_tablebase(tablebase)
+    elif ss_limit > 0:
+        ss_table(min(ss_limit, SS_TABLE_LIMIT))
+    solve_chopsticks()
+    _negamax = SSNegamax()
+
+
+def parse_position(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the position on line as a dict with the game ('s' or 'c'),
+    the value or packed chopsticks code and the player to move, or None
+    for a blank line. A line that is not a position raises a ValueError.
+    >>> parse_position('100')
+    {'game': 's', 'value': 100, 'is_p1_turn': True}
+    >>> parse_position('[1, 1, 2, 3] p2')['value']
+    326
+    >>> parse_position('1 2')
+    Traceback (most recent call last):
+    ValueError: expected a value or four hands
+    """
+
+    words = line.translate(_SEPARATORS).split()
+    if not words:
+        return None
+
+    is_p1_turn = True
+    if words[-1].lower() in ('p1', 'p2'):
+        is_p1_turn = words.pop().lower() == 'p1'
+    if not all(word.isdigit() for word in words):
+        raise ValueError("expected whole numbers")
+    numbers = [int(word) for word in words]
+
+    if len(numbers) == 1:
+        return {'game': 's', 'value': numbers[0], 'is_p1_turn': is_p1_turn}
+    if len(numbers) == 4:
+        if max(numbers) > 4:
+            raise ValueError("hands hold 0 to 4 fingers")
+        return {'game': 'c', 'value': cs_pack(numbers, is_p1_turn),
+                'is_p1_turn': is_p1_turn}
+    raise ValueError("expected a value or four hands")
+
+
+def analyze_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the analysis of the position on line, or None for a blank line.
+    >>> analyze_line('10')
+    {'input': '10', 'outcome': 'loss', 'move': 1}
+    >>> analyze_line('0 0 1 1')['outcome']
+    'loss'
+    >>> analyze_line('two')
+    {'input': 'two', 'error': 'expected whole numbers'}
+    """
+
+    text = line.strip()
+    try:
+        position = parse_position(text)
+    except ValueError as error:
+        return {'input': text, 'error': str(error)}
+    if position is None:
+        return None
+
+    key = position['game'], position['value']
+    answer = _answers.get(key)
+    if answer is None:
+        answer = _solve(*key)
+        _answers.put(key, answer)
+
+    return {'input': text, 'outcome': answer[0], 'move': answer[1]}
+
+
+def _solve(game: str, value: int) -> Tuple[str, Any]:
+    """
+    Return the outcome name and best move of the position value of game.
+    Subtract square values beyond ss_quick_limit() are searched rather
+    than solved into the table.
+    >>> from solvers import SS_ON_DEMAND_LIMIT
+    >>> _solve('s', 5 * 10 ** 7 + 1)[0]
+    'win'
+    >>> len(ss_table(0)) <= SS_ON_DEMAND_LIMIT + 1
+    True
+    """
+
+    if game == 'c':
+        solution = solve_chopsticks()
+        return (OUTCOME_NAMES[solution.lookup_code(value)[0]],
+                solution.best_move_code(value))
+
+    # values beyond what is solved or quick to solve are searched, so one
+    # large value does not make the worker solve a table that far
+    if value <= ss_quick_limit():
+        if ss_is_winning(value):
+            return 'win', ss_best_move(value)
+        return 'loss', 1 if value else None
+
+    global _negamax
+    if _negamax is None:
+        _negamax = SSNegamax()
+    outcome = _negamax.outcome(value)
+    return (OUTCOME_NAMES[outcome] if outcome != DRAW else 'unknown',
+            _negamax.best_move(value))
+
+
+def analyze_chunk(lines: List[str]) -> str:
+    """
+    Return the analyses of lines as JSON lines. Runs in a worker process.
+    >>> print(analyze_chunk(['4', '', '2 p2']), end='')
+    {"input": "4", "outcome": "win", "move": 4}
+    {"input": "2 p2", "outcome": "loss", "move": 1}
+    """
+
+    out = []
+    for line in lines:
+        analysis = analyze_line(line)
+        if analysis is not None:
+            out.append(json.dumps(analysis))
+            out.append('\n')
+    return ''.join(out)
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    """
+    Yield lines in lists of size lines (the last may be shorter).
+    """
+
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_stream(lines: Iterable[str], workers: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE, ss_limit: int = 0,
+                   tablebase: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the analyses of lines as blocks of JSON lines, in input order.
+    Chunks of chunk_size lines are answered by workers processes (all
+    cores by default; workers=1 answers them in this process), and at most
+    CHUNKS_PER_WORKER chunks per worker are read ahead.
+    >>> print(''.join(analyze_stream(['6', '1 1 1 1'], workers=1)), end='')
+    {"input": "6", "outcome": "win", "move": 1}
+    {"input": "1 1 1 1", "outcome": "draw", "move": "ll"}
+    """
+
+    chunks = _chunks(lines, chunk_size)
+    if workers == 1:
+        start_worker(ss_limit, tablebase)
+        for chunk in chunks:
+            yield analyze_chunk(chunk)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                             initargs=(ss_limit, tablebase)) as executor:
+        pending: Deque[Any] = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(analyze_chunk, chunk))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main() -> None:
+    """
+    Analyse the positions of a file or standard input from the command
+    line.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Print the outcome and best move of many positions.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="file of positions, one a line (- for stdin)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--ss-limit', type=int, default=0,
+                        help="solve subtract square up to this value in "
+                             "each worker before starting")
+    parser.add_argument('--tablebase', metavar='FILE',
+                        help="answer subtract square from this tablebase "
+                             "(see tablebase.py)")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    try:
+        for block in analyze_stream(source, args.workers, args.chunk_size,
+                                    args.ss_limit, args.tablebase):
+            sys.stdout.write(block)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
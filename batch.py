@@ -0,0 +1,271 @@
+"""
+Batches of games held as NumPy arrays and advanced in lockstep.
+
+SSBatch holds N subtract square games and CSBatch holds N chopsticks games.
+Both offer legal_mask(), is_over() and make_moves(actions), which work on
+every game at once, so random or policy playouts cost a few array
+operations per move instead of one Python object per game.
+This module needs NumPy.
+"""
+from typing import Any, Optional
+import numpy as np
+from games import CS_HAND_WEIGHTS, CS_STATE_COUNT, CS_LEGAL_MASKS
+from games import CS_TRANSITIONS, cs_unpack
+
+# Result codes of winners().
+ONGOING = 0
+P1_WON = 1
+P2_WON = 2
+
+# Batches still going after this many moves are stopped by play_random.
+MAX_PLAYOUT_MOVES = 1000
+
+# The chopsticks lookup tables of games.py as arrays, by packed position:
+# the legal moves, the position after each move and the hands.
+_CS_LEGAL = (np.array(CS_LEGAL_MASKS)[:, None] >> np.arange(4)) & 1 == 1
+_CS_NEXT = np.array(CS_TRANSITIONS, dtype=np.int16).reshape(-1, 4)
+_CS_HANDS = np.array([cs_unpack(code)[0] for code in range(CS_STATE_COUNT)],
+                     dtype=np.uint8)
+
+
+def batch_isqrt(values: np.ndarray) -> np.ndarray:
+    """
+    Return the integer square root of every value in values.
+    >>> batch_isqrt(np.array([0, 1, 15, 16, 10 ** 12, 10 ** 18 - 1]))
+    array([        0,         1,         3,         4,   1000000, 999999999])
+    """
+
+    roots = np.floor(np.sqrt(values.astype(np.float64))).astype(np.int64)
+    # floating point can be off by one for large values
+    roots -= roots * roots > values
+    roots += (roots + 1) * (roots + 1) <= values
+    return roots
+
+
+class SSBatch:
+    """
+    N subtract square games.
+    values - the current value of each game
+    is_p1_turn - whether p1 is to move in each game
+    """
+    values: np.ndarray
+    is_p1_turn: np.ndarray
+
+    def __init__(self, values: Any, is_p1_turn: Any = True) -> None:
+        """
+        Initialize games starting at values; is_p1_turn is one flag for
+        every game or one per game.
+        >>> SSBatch([10, 4], False).values
+        array([10,  4])
+        """
+
+        self.values = np.array(values, dtype=np.int64)
+        self.is_p1_turn = np.broadcast_to(
+            np.asarray(is_p1_turn, dtype=bool), self.values.shape).copy()
+
+    def __len__(self) -> int:
+        """
+        Return the number of games.
+        """
+
+        return len(self.values)
+
+    def move_counts(self) -> np.ndarray:
+        """
+        Return the number of moves in each game.
+        """
+
+        return batch_isqrt(self.values)
+
+    def legal_mask(self, max_root: Optional[int] = None) -> np.ndarray:
+        """
+        Return an (N, max_root) array whose entry [i, k] says whether the
+        square (k + 1) ** 2 can be subtracted in game i. max_root defaults
+        to the most moves any game has.
+        >>> SSBatch([3, 4]).legal_mask().astype(int)
+        array([[1, 0],
+               [1, 1]])
+        """
+
+        counts = self.move_counts()
+        if max_root is None:
+            max_root = int(counts.max()) if len(counts) else 0
+
+        return np.arange(1, max_root + 1) <= counts[:, None]
+
+    def is_over(self) -> np.ndarray:
+        """
+        Return whether each game is over (its value is 0).
+        """
+
+        return self.values <= 0
+
+    def winners(self) -> np.ndarray:
+        """
+        Return P1_WON, P2_WON or ONGOING for each game.
+        >>> SSBatch([0, 0, 5], [True, False, True]).winners()
+        array([2, 1, 0])
+        """
+
+        return np.where(self.is_over(),
+                        np.where(self.is_p1_turn, P2_WON, P1_WON), ONGOING)
+
+    def make_moves(self, actions: Any) -> None:
+        """
+        Subtract the square actions[i] in every game i that is not over;
+        finished games ignore their action.
+        >>> batch = SSBatch([10, 0])
+        >>> batch.make_moves([9, 4])
+        >>> batch.values, batch.is_p1_turn
+        (array([1, 0]), array([False,  True]))
+        """
+
+        actions = np.asarray(actions, dtype=np.int64)
+        active = ~self.is_over()
+        roots = batch_isqrt(actions)
+        legal = (roots > 0) & (roots * roots == actions) & \
+            (actions <= self.values)
+        if np.any(active & ~legal):
+            raise ValueError("illegal move in game {}".format(
+                int(np.flatnonzero(active & ~legal)[0])))
+
+        self.values -= np.where(active, actions, 0)
+        self.is_p1_turn ^= active
+
+    def random_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Return a uniformly random legal square for every game (0 for the
+        games that are over).
+        """
+
+        counts = self.move_counts()
+        roots = rng.integers(1, np.maximum(counts, 1) + 1)
+        return np.where(counts > 0, roots * roots, 0)
+
+
+class CSBatch:
+    """
+    N chopsticks games.
+    hands - an (N, 4) array of the hands of each game, in current_value order
+    is_p1_turn - whether p1 is to move in each game
+    Moves are given as indices into CS_MOVES.
+    """
+    hands: np.ndarray
+    is_p1_turn: np.ndarray
+
+    def __init__(self, size: int, is_p1_turn: Any = True) -> None:
+        """
+        Initialize size games in which both players start with 1-1.
+        >>> CSBatch(2).hands
+        array([[1, 1, 1, 1],
+               [1, 1, 1, 1]], dtype=uint8)
+        """
+
+        self.hands = np.ones((size, 4), dtype=np.uint8)
+        self.is_p1_turn = np.broadcast_to(
+            np.asarray(is_p1_turn, dtype=bool), (size,)).copy()
+
+    def __len__(self) -> int:
+        """
+        Return the number of games.
+        """
+
+        return len(self.hands)
+
+    def codes(self) -> np.ndarray:
+        """
+        Return the packed position (see games.cs_pack) of each game.
+        >>> int(CSBatch(1).codes()[0])
+        313
+        """
+
+        return (self.hands.astype(np.int16) @
+                np.array(CS_HAND_WEIGHTS, dtype=np.int16) + self.is_p1_turn)
+
+    def legal_mask(self) -> np.ndarray:
+        """
+        Return an (N, 4) array saying which of CS_MOVES are legal in each
+        game, looked up in the tables of games.py.
+        >>> from games import CS_MOVES
+        >>> batch = CSBatch(1)
+        >>> batch.hands[0] = [1, 1, 0, 3]
+        >>> [CS_MOVES[m] for m in np.flatnonzero(batch.legal_mask()[0])]
+        ['lr', 'rr']
+        """
+
+        return _CS_LEGAL[self.codes()]
+
+    def is_over(self) -> np.ndarray:
+        """
+        Return whether each game is over (the player to move has no moves).
+        """
+
+        return ~self.legal_mask().any(axis=1)
+
+    def winners(self) -> np.ndarray:
+        """
+        Return P1_WON, P2_WON or ONGOING for each game.
+        """
+
+        return np.where(self.is_over(),
+                        np.where(self.is_p1_turn, P2_WON, P1_WON), ONGOING)
+
+    def make_moves(self, actions: Any) -> None:
+        """
+        Play the move CS_MOVES[actions[i]] in every game i that is not
+        over; finished games ignore their action.
+        >>> from games import CS_MOVES
+        >>> batch = CSBatch(2, [True, False])
+        >>> batch.make_moves([CS_MOVES.index('ll'), CS_MOVES.index('rr')])
+        >>> batch.hands
+        array([[1, 1, 2, 1],
+               [1, 2, 1, 1]], dtype=uint8)
+        """
+
+        actions = np.asarray(actions, dtype=np.int64)
+        codes = self.codes()
+        mask = _CS_LEGAL[codes]
+        active = mask.any(axis=1)
+        rows = np.arange(len(self))
+        in_range = (actions >= 0) & (actions < 4)
+        legal = in_range & mask[rows, actions & 3]
+        if np.any(active & ~legal):
+            raise ValueError("illegal move in game {}".format(
+                int(np.flatnonzero(active & ~legal)[0])))
+
+        codes = np.where(active, _CS_NEXT[codes, actions & 3], codes)
+        self.hands = _CS_HANDS[codes]
+        self.is_p1_turn = (codes & 1).astype(bool)
+
+    def random_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Return a uniformly random legal move index for every game (0 for
+        the games that are over).
+        """
+
+        keys = rng.random((len(self), 4))
+        keys[~self.legal_mask()] = -1.0
+        return keys.argmax(axis=1)
+
+
+def play_random(batch: Any, rng: Optional[np.random.Generator] = None,
+                max_moves: int = MAX_PLAYOUT_MOVES) -> np.ndarray:
+    """
+    Play uniformly random moves in every game of batch until all of them
+    are over or max_moves moves have been made, and return winners().
+    Games still going at the end are ONGOING (draws).
+    >>> winners = play_random(SSBatch([10 ** 12] * 100),
+    ...                       np.random.default_rng(0))
+    >>> int((winners == ONGOING).sum())
+    0
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    for _ in range(max_moves):
+        if batch.is_over().all():
+            break
+        batch.make_moves(batch.random_moves(rng))
+
+    return batch.winners()
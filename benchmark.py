@@ -0,0 +1,270 @@
+"""
+Benchmark the game engine and save or compare the results as JSON.
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+
+Compare mode exits with status 1 if any benchmark got slower than the
+baseline by more than the threshold.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from games import SSGameCurrentState, CSGameCurrentState, SubtractSquareGame
+from games import ChopsticksGame
+from simulate import play_game
+from solvers import np, solve_subtract_square, build_chopsticks_solution
+from strategy import current_strategy
+
+# Subtract square values the state benchmarks run at.
+SS_SIZES = (10, 10 ** 4, 10 ** 8, 10 ** 12)
+
+# A benchmark is run for at least this many seconds per repeat.
+MIN_TIME = 0.2
+
+# The best of this many repeats is reported.
+REPEATS = 3
+
+# The slowdown (as a fraction of the baseline) that compare mode flags.
+REGRESSION_THRESHOLD = 0.10
+
+# Operations run while measuring allocations.
+_ALLOCATION_OPS = 1000
+
+
+def _random_game(game_class: type, *args: Any) -> Callable[[], Any]:
+    """
+    Return a benchmark body that plays one random game of game_class.
+    """
+
+    def body() -> Any:
+        return play_game(game_class(*args), current_strategy,
+                         current_strategy)
+
+    return body
+
+
+def _chopsticks_midgame() -> CSGameCurrentState:
+    """
+    Return a chopsticks position a few moves into a game.
+    """
+
+    state = CSGameCurrentState(True)
+    for move in ("ll", "rr", "lr", "rl"):
+        state = state.make_move(move)
+
+    return state
+
+
+def benchmarks() -> List[Tuple[str, Callable[[], Any]]]:
+    """
+    Return every benchmark as a (name, body) pair; each call of body is
+    one operation.
+    >>> names = [name for name, body in benchmarks()]
+    >>> 'ss.make_move.10000' in names and 'cs.random_game' in names
+    True
+    """
+
+    cases = []
+
+    for size in SS_SIZES:
+        state = SSGameCurrentState(True, size)
+        same = SSGameCurrentState(True, size)
+        square = int(size ** 0.5) ** 2
+        cases += [
+            ('ss.get_possible_moves.{}'.format(size),
+             state.get_possible_moves),
+            ('ss.is_valid_move.{}'.format(size),
+             lambda state=state, square=square: state.is_valid_move(square)),
+            ('ss.make_move.{}'.format(size),
+             lambda state=state: state.make_move(1)),
+            ('ss.eq.{}'.format(size),
+             lambda state=state, same=same: state == same),
+            ('ss.push_pop.{}'.format(size),
+             lambda state=state: (state.push(1), state.pop()))]
+
+    for label, state in (('start', CSGameCurrentState(True)),
+                         ('midgame', _chopsticks_midgame())):
+        same = CSGameCurrentState(True)
+        same.code = state.code
+        move = state.get_possible_moves()[0]
+        cases += [
+            ('cs.get_possible_moves.{}'.format(label),
+             state.get_possible_moves),
+            ('cs.is_valid_move.{}'.format(label),
+             lambda state=state, move=move: state.is_valid_move(move)),
+            ('cs.make_move.{}'.format(label),
+             lambda state=state, move=move: state.make_move(move)),
+            ('cs.eq.{}'.format(label),
+             lambda state=state, same=same: state == same),
+            ('cs.push_pop.{}'.format(label),
+             lambda state=state, move=move: (state.push(move), state.pop()))]
+
+    cases += [
+        ('ss.random_game.100', _random_game(SubtractSquareGame, True, 100)),
+        ('ss.random_game.{}'.format(10 ** 12),
+         _random_game(SubtractSquareGame, True, 10 ** 12)),
+        ('cs.random_game', _random_game(ChopsticksGame, True)),
+        ('solve.subtract_square.{}'.format(10 ** 6),
+         lambda: solve_subtract_square(10 ** 6)),
+        ('solve.chopsticks', build_chopsticks_solution)]
+
+    return cases
+
+
+def _ops_per_second(body: Callable[[], Any], min_time: float,
+                    repeats: int) -> Tuple[float, int]:
+    """
+    Return the best operations per second of body over repeats timed runs,
+    and the number of operations in each run.
+    """
+
+    # find how many operations fill min_time, as timeit does
+    number = 1
+    while True:
+        began = time.perf_counter()
+        for _ in range(number):
+            body()
+        elapsed = time.perf_counter() - began
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    best = elapsed
+    for _ in range(repeats - 1):
+        began = time.perf_counter()
+        for _ in range(number):
+            body()
+        best = min(best, time.perf_counter() - began)
+
+    return number / best, number
+
+
+def _allocated_bytes_per_op(body: Callable[[], Any], ops: int) -> float:
+    """
+    Return the bytes allocated by a call of body, averaged over ops calls.
+    tracemalloc sees every allocation, so this is the peak of traced memory
+    during each call above where it started: temporaries freed inside the
+    call count as well as the result.
+    >>> _allocated_bytes_per_op(lambda: None, 10)
+    0.0
+    >>> _allocated_bytes_per_op(lambda: len([0] * 1000), 10) >= 8000
+    True
+    """
+
+    body()
+    total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(ops):
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = body()
+            total += tracemalloc.get_traced_memory()[1] - start
+            del result
+    finally:
+        tracemalloc.stop()
+
+    return total / ops
+
+
+def run(name_filter: str = '', min_time: float = MIN_TIME,
+        repeats: int = REPEATS) -> Dict[str, Any]:
+    """
+    Run every benchmark whose name contains name_filter and return the
+    results with a description of the machine.
+    >>> report = run('cs.eq.start', min_time=0.001, repeats=1)
+    >>> report['results']['cs.eq.start']['ops_per_sec'] > 0
+    True
+    """
+
+    random.seed(0)
+    results = {}
+    for name, body in benchmarks():
+        if name_filter not in name:
+            continue
+        ops_per_sec, number = _ops_per_second(body, min_time, repeats)
+        allocated = _allocated_bytes_per_op(body,
+                                            min(number, _ALLOCATION_OPS))
+        results[name] = {'ops_per_sec': ops_per_sec,
+                         'alloc_bytes_per_op': allocated,
+                         'number': number}
+
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'numpy': np.__version__ if np is not None else None,
+            'results': results}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """
+    Return a line for every benchmark of report that is slower than in
+    baseline by more than threshold (a fraction).
+    >>> old = {'results': {'a': {'ops_per_sec': 100.0}}}
+    >>> new = {'results': {'a': {'ops_per_sec': 80.0}}}
+    >>> compare(new, old)
+    ['a: 100 -> 80 ops/sec (-20.0%)']
+    >>> compare(old, new)
+    []
+    """
+
+    regressions = []
+    for name, result in sorted(report['results'].items()):
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['ops_per_sec']
+        after = result['ops_per_sec']
+        if after < before * (1 - threshold):
+            regressions.append("{}: {:.0f} -> {:.0f} ops/sec ({:+.1f}%)"
+                               .format(name, before, after,
+                                       100 * (after / before - 1)))
+
+    return regressions
+
+
+def main() -> Optional[int]:
+    """
+    Run the benchmarks from the command line.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark the game engine.")
+    parser.add_argument('--filter', default='',
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--output', help="file to save the results to "
+                                         "(default: print them)")
+    parser.add_argument('--compare', help="baseline results to compare with")
+    parser.add_argument('--threshold', type=float,
+                        default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run(args.filter, args.min_time, args.repeats)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        if regressions:
+            return 1
+
+    return None
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Cooperative cancellation of searches running in another thread.
+
+A thread whose searches may have to be abandoned (e.g. a Ponderer's)
+registers an event with cancel_searches_on. The long loops of the
+strategies call check_cancelled every so often, which raises
+SearchCancelled in that thread once its event is set. Searches in threads
+without an event never stop early.
+"""
+from typing import Optional
+import threading
+
+# How many steps (nodes, positions or playouts) a search takes between
+# calls of check_cancelled.
+CHECK_INTERVAL = 1024
+
+_local = threading.local()
+
+
+class SearchCancelled(Exception):
+    """
+    Raised by check_cancelled when the searches of the calling thread
+    have been cancelled.
+    """
+
+
+def cancel_searches_on(event: Optional[threading.Event]) -> None:
+    """
+    Make the searches of the calling thread stop once event is set, or
+    never if event is None.
+    >>> stop = threading.Event()
+    >>> cancel_searches_on(stop)
+    >>> check_cancelled()
+    >>> stop.set()
+    >>> check_cancelled()
+    Traceback (most recent call last):
+    ...
+    cancel.SearchCancelled
+    >>> cancel_searches_on(None)
+    """
+
+    _local.event = event
+
+
+def check_cancelled() -> None:
+    """
+    Raise SearchCancelled if the searches of the calling thread have been
+    cancelled.
+    """
+
+    event = getattr(_local, 'event', None)
+    if event is not None and event.is_set():
+        raise SearchCancelled
@@ -0,0 +1,752 @@
+"""
+Chopsticks with other rules: any modulus, any number of hands per player,
+splits, and hands that die at the modulus (cut-off) instead of rolling over.
+
+A position is packed into one int as for cs_pack: every hand as a base-
+modulus digit, p1's hands first, followed by a turn bit that is set for p1.
+With the standard rules the packing is the same as cs_pack's.
+
+solve_variant solves every position by retrograde analysis over flat
+integer arrays (NumPy, or the array module without it). Only positions
+with each player's hands in increasing order are solved, as for the
+standard game, so variants with millions of positions fit in memory.
+"""
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import combinations_with_replacement, product
+from games import GameCurrentState, ChopsticksGame
+from solvers import np, WIN, DRAW, LOSS
+
+
+class ChopsticksRules(NamedTuple):
+    """
+    The rules of a chopsticks variant.
+    modulus - a hand holding this many fingers is dead
+    hands - the number of hands of each player
+    splits - whether a player may move fingers between their own hands
+             instead of tapping
+    cutoff - whether a tap reaching the modulus or more kills the hand,
+             rather than rolling over to the remainder
+    """
+    modulus: int = 5
+    hands: int = 2
+    splits: bool = False
+    cutoff: bool = False
+
+    @property
+    def state_count(self) -> int:
+        """
+        The number of packed positions.
+        >>> ChopsticksRules().state_count
+        1250
+        >>> ChopsticksRules(modulus=7, hands=3).state_count
+        235298
+        """
+
+        return self.modulus ** (2 * self.hands) * 2
+
+    @property
+    def hand_names(self) -> str:
+        """
+        The letter naming each hand in moves: l and r for two hands,
+        otherwise digits from 1.
+        """
+
+        if self.hands == 2:
+            return "lr"
+        return "123456789"[:self.hands]
+
+    def weights(self) -> List[int]:
+        """
+        Return the weight of each hand in a packed position.
+        >>> ChopsticksRules().weights()
+        [250, 50, 10, 2]
+        """
+
+        return [self.modulus ** (2 * self.hands - 1 - hand) * 2
+                for hand in range(2 * self.hands)]
+
+    def pack(self, hands: List[int], is_p1_turn: bool) -> int:
+        """
+        Return the position with hands (p1's, then p2's) and the given
+        player to move, packed into an int.
+        >>> ChopsticksRules().pack([1, 1, 1, 1], True)
+        313
+        """
+
+        digits = 0
+        for hand in hands:
+            digits = digits * self.modulus + hand
+        return (digits << 1) | int(is_p1_turn)
+
+    def unpack(self, code: int) -> Tuple[List[int], bool]:
+        """
+        Return the hands and whether p1 is to move for the packed position.
+        >>> ChopsticksRules(hands=3).unpack(ChopsticksRules(hands=3).pack(
+        ...     [1, 2, 3, 4, 0, 1], False))
+        ([1, 2, 3, 4, 0, 1], False)
+        """
+
+        digits = code >> 1
+        hands = []
+        for _ in range(2 * self.hands):
+            digits, hand = divmod(digits, self.modulus)
+            hands.append(hand)
+        hands.reverse()
+        return hands, bool(code & 1)
+
+    def canonical(self, code: int) -> int:
+        """
+        Return the packed position code with each player's hands in
+        increasing order; the hands of a player are interchangeable under
+        every rule.
+        >>> ChopsticksRules().unpack(ChopsticksRules().canonical(
+        ...     ChopsticksRules().pack([3, 1, 4, 0], True)))
+        ([1, 3, 0, 4], True)
+        """
+
+        hands, is_p1_turn = self.unpack(code)
+        count = self.hands
+        return self.pack(sorted(hands[:count]) + sorted(hands[count:]),
+                         is_p1_turn)
+
+    def tap(self, source: int, target: int) -> int:
+        """
+        Return the fingers on a hand holding target after a hand holding
+        source taps it.
+        >>> ChopsticksRules().tap(3, 4), ChopsticksRules(cutoff=True).tap(3, 4)
+        (2, 0)
+        """
+
+        total = source + target
+        if self.cutoff:
+            return total if total < self.modulus else 0
+        return total % self.modulus
+
+    def split_targets(self, own: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        """
+        Return the hands a player holding own can split into: the same
+        number of fingers spread differently, not just the hands swapped.
+        >>> ChopsticksRules(splits=True).split_targets((0, 4))
+        [(1, 3), (2, 2), (3, 1)]
+        """
+
+        if not self.splits:
+            return []
+        return _split_targets(self, own)
+
+    def split_name(self, hands: Tuple[int, ...]) -> str:
+        """
+        Return the name of the split move into hands, e.g. 's13'.
+        """
+
+        separator = "" if self.modulus <= 10 else ","
+        return "s" + separator.join(map(str, hands))
+
+    def successors(self, code: int) -> List[Tuple[str, int]]:
+        """
+        Return the legal moves in the packed position code, each with the
+        position it leads to. A tap uses one of the mover's live hands on
+        one of the opponent's live hands.
+        >>> rules = ChopsticksRules(splits=True)
+        >>> [move for move, child in rules.successors(
+        ...     rules.pack([0, 4, 1, 1], True))]
+        ['rl', 'rr', 's13', 's22', 's31']
+        """
+
+        hands, is_p1_turn = self.unpack(code)
+        count = self.hands
+        own_first = 0 if is_p1_turn else count
+        opp_first = count - own_first
+        weights = self.weights()
+        names = self.hand_names
+        moves = []
+
+        for own in range(count):
+            source = hands[own_first + own]
+            if source == 0:
+                continue
+            for opp in range(count):
+                target = hands[opp_first + opp]
+                if target == 0:
+                    continue
+                child = code + ((self.tap(source, target) - target) *
+                                weights[opp_first + opp])
+                moves.append((names[own] + names[opp], child ^ 1))
+
+        own_hands = tuple(hands[own_first:own_first + count])
+        for split in self.split_targets(own_hands):
+            child = code
+            for own in range(count):
+                child += ((split[own] - own_hands[own]) *
+                          weights[own_first + own])
+            moves.append((self.split_name(split), child ^ 1))
+
+        return moves
+
+    def describe(self) -> str:
+        """
+        Return a short description of the rules.
+        >>> ChopsticksRules(modulus=7, hands=3, splits=True).describe()
+        'modulus 7, 3 hands each, splits, roll-over'
+        """
+
+        return "modulus {}, {} hands each, {}, {}".format(
+            self.modulus, self.hands,
+            "splits" if self.splits else "no splits",
+            "cut-off" if self.cutoff else "roll-over")
+
+
+# The rules ChopsticksGame is played by.
+STANDARD_RULES = ChopsticksRules()
+
+# split_targets of every hand seen so far, by rules and hand.
+_splits: Dict[Tuple[ChopsticksRules, Tuple[int, ...]],
+              List[Tuple[int, ...]]] = {}
+
+
+def _split_targets(rules: ChopsticksRules,
+                   own: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+    """
+    Work out rules.split_targets(own), remembering the answer.
+    """
+
+    key = (rules, own)
+    if key not in _splits:
+        total = sum(own)
+        _splits[key] = [
+            split for split in product(range(rules.modulus),
+                                       repeat=rules.hands)
+            if sum(split) == total and sorted(split) != sorted(own)]
+
+    return _splits[key]
+
+
+class VariantState(GameCurrentState):
+    """
+    Keeps track of a chopsticks variant being played.
+    rules - the rules of the variant
+    code - the packed position
+    """
+    rules: ChopsticksRules
+    code: int
+
+    def __init__(self, is_p1_turn: bool,
+                 rules: ChopsticksRules = STANDARD_RULES) -> None:
+        """
+        Initialize the position in which every hand holds one finger.
+        >>> print(VariantState(False, ChopsticksRules(hands=3)))
+        Player 1: 1-1-1; Player 2 [Current]: 1-1-1
+        """
+
+        self.rules = rules
+        self.code = rules.pack([1] * (2 * rules.hands), is_p1_turn)
+
+    __hash__ = GameCurrentState.__hash__
+
+    @property
+    def key(self) -> int:
+        """
+        The packed position.
+        """
+
+        return self.code
+
+    @property
+    def canonical_key(self) -> int:
+        """
+        The packed position with each player's hands in increasing order;
+        the hands of a player are interchangeable under every rule.
+        >>> state = VariantState(True).make_move("ll")
+        >>> state.canonical_key == VariantState(True).make_move("lr").key
+        True
+        """
+
+        return self.rules.canonical(self.code)
+
+    @property
+    def is_p1_turn(self) -> bool:
+        """
+        Whether p1 is to move.
+        """
+
+        return bool(self.code & 1)
+
+    @property
+    def current_value(self) -> List[int]:
+        """
+        The fingers on every hand, p1's hands first.
+        """
+
+        return self.rules.unpack(self.code)[0]
+
+    def __str__(self) -> str:
+        """
+        Return a user-friendly string representation of VariantState.
+        """
+
+        hands = [str(hand) for hand in self.current_value]
+        count = self.rules.hands
+        p1 = "-".join(hands[:count])
+        p2 = "-".join(hands[count:])
+
+        if self.is_p1_turn:
+            return "Player 1 [Current]: {}; Player 2: {}".format(p1, p2)
+        return "Player 1: {}; Player 2 [Current]: {}".format(p1, p2)
+
+    def get_possible_moves(self) -> List[str]:
+        """
+        Return the possible moves, given the current game state.
+        >>> state = VariantState(True, ChopsticksRules(hands=3))
+        >>> state.get_possible_moves()[:4]
+        ['11', '12', '13', '21']
+        """
+
+        return [move for move, child in self.rules.successors(self.code)]
+
+    def is_valid_move(self, move_to_make: Any) -> bool:
+        """
+        Return whether move_to_make is legal given the current game state.
+        """
+
+        return move_to_make in self.get_possible_moves()
+
+    def make_move(self, move_to_make: str) -> 'VariantState':
+        """
+        Return the position after move_to_make.
+        >>> rules = ChopsticksRules(cutoff=True, splits=True)
+        >>> print(VariantState(True, rules).make_move("s02"))
+        Player 1: 0-2; Player 2 [Current]: 1-1
+        """
+
+        state = type(self).__new__(type(self))
+        state.rules = self.rules
+        state.code = dict(self.rules.successors(self.code))[move_to_make]
+
+        return state
+
+    def push(self, move_to_make: str) -> None:
+        """
+        Play move_to_make on this state itself; pop takes it back.
+        >>> state = VariantState(True)
+        >>> state.push("ll")
+        >>> state.pop(), state == VariantState(True)
+        ('ll', True)
+        """
+
+        stack = self._undo_stack()
+        stack.append(self.code)
+        stack.append(move_to_make)
+        self.code = dict(self.rules.successors(self.code))[move_to_make]
+
+    def pop(self) -> str:
+        """
+        Take back the last move played by push, and return it.
+        """
+
+        stack = self._undo_stack()
+        move = stack.pop()
+        self.code = stack.pop()
+
+        return move
+
+
+class ChopsticksVariantGame(ChopsticksGame):
+    """
+    Chopsticks played by other rules; see ChopsticksRules.
+    """
+    rules: ChopsticksRules
+    current_state: VariantState
+
+    def __init__(self, is_p1_turn: bool,
+                 rules: ChopsticksRules = STANDARD_RULES) -> None:
+        """
+        Initialize the chopsticks variant with rules;
+        set which player (1 or 2) should move first.
+        """
+
+        self.is_p1_turn = is_p1_turn
+        self.rules = rules
+        self.current_state = VariantState(is_p1_turn, rules)
+
+    def __str__(self) -> str:
+        """
+        Return a user-friendly string representation of the game.
+        >>> print(ChopsticksVariantGame(True, ChopsticksRules(cutoff=True)))
+        This is a chopsticks game (modulus 5, 2 hands each, no splits, \
+cut-off), and it's p1's turn to move.
+        """
+
+        return ("This is a chopsticks game ({}), and it's {}'s turn to "
+                "move.".format(self.rules.describe(),
+                               'p1' if self.is_p1_turn else 'p2'))
+
+    def get_instructions(self) -> str:
+        """
+        Provides the instructions for the chopsticks variant.
+        """
+
+        return (self.Game_Description_CS + " These rules are changed to: "
+                + self.rules.describe() + ".")
+
+
+class VariantSolution:
+    """
+    The outcome of every position of a chopsticks variant under perfect
+    play, in flat arrays. As in ChopsticksSolution, only canonical
+    positions (see ChopsticksRules.canonical) are stored.
+    rules - the rules of the variant
+    positions - the canonical packed positions, in increasing order; the
+                row of a position in the arrays below is its index here
+    outcome - WIN, LOSS or DRAW for the player to move, by row
+    distance - plies until the game ends under perfect play (-1 for draws),
+               by row
+    """
+    rules: ChopsticksRules
+    positions: Any
+    outcome: Any
+    distance: Any
+
+    def __init__(self, rules: ChopsticksRules, positions: Any, outcome: Any,
+                 distance: Any) -> None:
+        """
+        Initialize this VariantSolution with the solved arrays.
+        """
+
+        self.rules = rules
+        self.positions = positions
+        self.outcome = outcome
+        self.distance = distance
+
+    def __len__(self) -> int:
+        """
+        Return the number of positions stored.
+        >>> len(solve_variant(STANDARD_RULES))
+        450
+        """
+
+        return len(self.positions)
+
+    def row(self, code: int) -> int:
+        """
+        Return the row of the packed position code.
+        """
+
+        return bisect_left(self.positions, self.rules.canonical(code))
+
+    def lookup(self, state: VariantState) -> Tuple[int, int]:
+        """
+        Return the outcome and distance to the end of state.
+        >>> solve_variant(STANDARD_RULES).lookup(VariantState(True))
+        (0, -1)
+        """
+
+        row = self.row(state.code)
+        return int(self.outcome[row]), int(self.distance[row])
+
+    def best_move(self, state: VariantState) -> Optional[str]:
+        """
+        Return the move that keeps the best outcome for the player to move
+        in state: the fastest win, the slowest loss, or a move that keeps
+        the draw. Return None if there are no moves. The moves are those of
+        state itself, so they need no turning back from a canonical one.
+        >>> rules = ChopsticksRules(splits=True, cutoff=True)
+        >>> state = VariantState(True, rules)
+        >>> solve_variant(rules).best_move(state) in state.get_possible_moves()
+        True
+        """
+
+        best_move = None
+        best_rank = None
+
+        for move, child in self.rules.successors(state.code):
+            row = self.row(child)
+            outcome = -int(self.outcome[row])
+            distance = int(self.distance[row])
+            if outcome == WIN:
+                rank = (WIN, -distance)
+            else:
+                rank = (outcome, distance)
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = move, rank
+
+        return best_move
+
+
+# The variants solved so far, by rules.
+_variant_solutions: Dict[ChopsticksRules, VariantSolution] = {}
+
+
+def solve_variant(rules: ChopsticksRules) -> VariantSolution:
+    """
+    Return the solved variant with rules, solving it on the first call.
+    >>> rules = ChopsticksRules(cutoff=True)
+    >>> solve_variant(rules).lookup(VariantState(True, rules))
+    (-1, 8)
+    """
+
+    if rules not in _variant_solutions:
+        _variant_solutions[rules] = build_variant_solution(rules)
+
+    return _variant_solutions[rules]
+
+
+def _canonical_positions(rules: ChopsticksRules) -> List[int]:
+    """
+    Return the canonical packed positions of rules, in increasing order:
+    each player's hands in increasing order, and either player to move.
+    >>> len(_canonical_positions(STANDARD_RULES))
+    450
+    """
+
+    block = rules.modulus ** rules.hands
+    digits = [rules.pack(list(hands), False) >> 1 for hands in
+              combinations_with_replacement(range(rules.modulus),
+                                            rules.hands)]
+    return sorted(((p1 * block + p2) << 1) | turn
+                  for p1 in digits for p2 in digits for turn in (0, 1))
+
+
+def build_variant_solution(rules: ChopsticksRules) -> VariantSolution:
+    """
+    Solve the variant with rules from scratch by retrograde analysis, as
+    build_chopsticks_solution does, over canonical positions and with the
+    position graph in flat arrays: the predecessors of every position are
+    one slice of a single array (compressed sparse rows), and each position
+    needs a few bytes.
+
+    Two moves of a position may lead to the same canonical position. Such
+    a move is kept twice, both in the count of moves of its position and
+    among the predecessors of its child, so the two stay in step.
+    """
+
+    if np is None:
+        return _build_variant_solution_arrays(rules)
+
+    positions = np.array(_canonical_positions(rules), dtype=np.int64)
+    size = len(positions)
+    index_type = np.int32 if size < 2 ** 31 else np.int64
+
+    # every predecessor of row r is in predecessors[starts[r]:
+    # starts[r + 1]], filled by counting sort over two passes of the moves;
+    # unresolved counts the moves of each row
+    starts = np.zeros(size + 1, dtype=np.int64)
+    unresolved = np.zeros(size, dtype=np.int32)
+    for parents, children in _variant_moves(rules, positions):
+        np.add.at(starts, children + 1, 1)
+        np.add.at(unresolved, parents, 1)
+    np.cumsum(starts, out=starts)
+
+    predecessors = np.zeros(int(starts[-1]), dtype=index_type)
+    fill = starts[:-1].copy()
+    for parents, children in _variant_moves(rules, positions):
+        # a child may appear more than once, so place the copies in turn
+        order = np.argsort(children, kind='stable')
+        parents, children = parents[order], children[order]
+        first = np.searchsorted(children, children)
+        slots = fill[children] + np.arange(len(children)) - first
+        predecessors[slots] = parents
+        np.add.at(fill, children, 1)
+    del fill
+
+    outcome = np.full(size, DRAW, dtype=np.int8)
+    distance = np.full(size, -1, dtype=np.int32)
+    losses = np.flatnonzero(unresolved == 0)
+    wins = np.zeros(0, dtype=np.int64)
+    outcome[losses] = LOSS
+    distance[losses] = 0
+    depth = 0
+
+    # label a whole distance at a time: a position with a lost child is a
+    # win, and one whose children are all wins is a loss
+    while len(losses) or len(wins):
+        depth += 1
+
+        new_wins = _gather(predecessors, starts, losses)
+        new_wins = np.unique(new_wins[distance[new_wins] == -1])
+        outcome[new_wins] = WIN
+        distance[new_wins] = depth
+
+        resolved, counts = np.unique(_gather(predecessors, starts, wins),
+                                     return_counts=True)
+        unresolved[resolved] -= counts.astype(np.int32)
+        new_losses = resolved[(unresolved[resolved] == 0) &
+                              (distance[resolved] == -1)]
+        outcome[new_losses] = LOSS
+        distance[new_losses] = depth
+
+        losses, wins = new_losses, new_wins
+
+    return VariantSolution(rules, positions, outcome, distance)
+
+
+def _gather(values: Any, starts: Any, rows: Any) -> Any:
+    """
+    Return the concatenated slices values[starts[r]:starts[r + 1]] of
+    every r in rows.
+    >>> np is None or _gather(np.arange(10), np.array([0, 2, 5, 10]),
+    ...                       np.array([2, 0])).tolist() == [5, 6, 7, 8, 9, 0, 1]
+    True
+    """
+
+    first = starts[rows]
+    lengths = starts[rows + 1] - first
+    total = int(lengths.sum())
+    if total == 0:
+        return values[:0]
+
+    # each output index is its row's start plus its offset in the row
+    offsets = np.repeat(first - np.cumsum(lengths) + lengths, lengths)
+    return values[offsets + np.arange(total)]
+
+
+def _canonical_rows(rules: ChopsticksRules, positions: Any,
+                    codes: Any) -> Any:
+    """
+    Return the rows in positions of the canonical forms of the packed
+    positions codes, sorting each player's hands as rules.canonical does.
+    """
+
+    count = rules.hands
+    modulus = rules.modulus
+    digits = codes >> 1
+    hands = np.empty((len(codes), 2 * count), dtype=np.int64)
+    for hand in range(2 * count - 1, -1, -1):
+        digits, hands[:, hand] = np.divmod(digits, modulus)
+    hands[:, :count].sort(axis=1)
+    hands[:, count:].sort(axis=1)
+
+    canonical = np.zeros(len(codes), dtype=np.int64)
+    for hand in range(2 * count):
+        canonical = canonical * modulus + hands[:, hand]
+    return np.searchsorted(positions, (canonical << 1) | (codes & 1))
+
+
+def _variant_moves(rules: ChopsticksRules,
+                   positions: Any) -> Iterator[Tuple[Any, Any]]:
+    """
+    Yield the legal moves of rules from the canonical positions a move
+    shape at a time, as arrays of the rows moved from and the rows of the
+    canonical positions moved to. Moves that repeat another move of the
+    same position (tapping with an equal hand) are left out.
+    """
+
+    count = rules.hands
+    modulus = rules.modulus
+    weights = rules.weights()
+    codes = positions
+    rows = np.arange(len(codes), dtype=np.int64)
+    p1_turn = (codes & 1).astype(bool)
+    hands = [((codes >> 1) // (weight >> 1) % modulus).astype(np.int8)
+             for weight in weights]
+    own_hands = [np.where(p1_turn, hands[own], hands[count + own])
+                 for own in range(count)]
+
+    def to_rows(children: Any) -> Any:
+        return _canonical_rows(rules, positions, children)
+
+    for own in range(count):
+        source = own_hands[own]
+        live = source > 0
+        for earlier in own_hands[:own]:
+            live &= source != earlier
+        for opp in range(count):
+            target = np.where(p1_turn, hands[count + opp], hands[opp])
+            legal = np.flatnonzero(live & (target > 0))
+            parents = codes[legal]
+            weight = np.where(p1_turn[legal], weights[count + opp],
+                              weights[opp])
+            total = source[legal].astype(np.int64) + target[legal]
+            if not rules.cutoff:
+                yield rows[legal], to_rows(
+                    (parents + (total % modulus - target[legal]) *
+                     weight) ^ 1)
+                continue
+
+            # a cut-off hand becomes 0 whatever it held
+            tapped = np.where(total < modulus, total, 0)
+            yield rows[legal], to_rows(
+                (parents + (tapped - target[legal]) * weight) ^ 1)
+
+    if not rules.splits:
+        return
+
+    # the mover's hands as count digits: the high digits for p1, the low
+    # ones for p2, which scale by block * 2 and 2 in a packed position
+    block = modulus ** count
+    mover = np.where(p1_turn, (codes >> 1) // block, (codes >> 1) % block)
+    scale = np.where(p1_turn, block * 2, 2)
+    for own in combinations_with_replacement(range(modulus), count):
+        splits = rules.split_targets(own)
+        if not splits:
+            continue
+        own_digits = rules.pack(list(own), False) >> 1
+        holding = np.flatnonzero(mover == own_digits)
+        for split in splits:
+            delta = (rules.pack(list(split), False) >> 1) - own_digits
+            yield rows[holding], to_rows(
+                (codes[holding] + delta * scale[holding]) ^ 1)
+
+
+def _build_variant_solution_arrays(rules: ChopsticksRules) -> VariantSolution:
+    """
+    build_variant_solution without NumPy: the same flat layout in arrays of
+    the array module, labelled one position at a time. Moves to the same
+    canonical position count once.
+    """
+
+    positions = array('q', _canonical_positions(rules))
+    size = len(positions)
+    child_starts = array('q', [0])
+    child_list = array('l')
+    for code in positions:
+        child_list.extend(sorted(
+            {bisect_left(positions, rules.canonical(child))
+             for move, child in rules.successors(code)}))
+        child_starts.append(len(child_list))
+
+    counts = array('l', bytes(array('l').itemsize * (size + 1)))
+    for child in child_list:
+        counts[child + 1] += 1
+    for row in range(size):
+        counts[row + 1] += counts[row]
+    starts = array('q', counts)
+    predecessors = array('l', bytes(array('l').itemsize * len(child_list)))
+    for row in range(size):
+        for index in range(child_starts[row], child_starts[row + 1]):
+            child = child_list[index]
+            predecessors[counts[child]] = row
+            counts[child] += 1
+    unresolved = array('l', (child_starts[row + 1] - child_starts[row]
+                             for row in range(size)))
+    del child_list, child_starts, counts
+
+    outcome = array('b', [DRAW]) * size
+    distance = array('l', [-1]) * size
+    queue = deque()
+    for row in range(size):
+        if unresolved[row] == 0:
+            outcome[row] = LOSS
+            distance[row] = 0
+            queue.append(row)
+
+    while queue:
+        row = queue.popleft()
+        for index in range(starts[row], starts[row + 1]):
+            parent = predecessors[index]
+            if distance[parent] != -1:
+                continue
+            if outcome[row] == LOSS:
+                outcome[parent] = WIN
+                distance[parent] = distance[row] + 1
+                queue.append(parent)
+            else:
+                unresolved[parent] -= 1
+                if unresolved[parent] == 0:
+                    outcome[parent] = LOSS
+                    distance[parent] = distance[row] + 1
+                    queue.append(parent)
+
+    return VariantSolution(rules, positions, outcome, distance)
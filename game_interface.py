@@ -1,16 +1,28 @@
 # Import the modules needed to make game_interface run.
 from strategy import interactive_strategy, current_strategy
+from strategy import minimax_strategy, mcts_strategy, negamax_strategy
 from games import Game, SSGameCurrentState, SubtractSquareGame
 from games import CSGameCurrentState, ChopsticksGame
-from typing import Any, Callable
-
-# Note: 's' should map to Subtract Square, and 'c' should map to Chopsticks.
+from subtraction import MultiHeapSubtractSquareGame
+from instrumentation import Instrumentation, json_lines_hook
+from ponder import Ponderer
+from render import Renderer
+from typing import Any, Callable, Optional
+import argparse
+import time
+
+# Note: 's' should map to Subtract Square, and 'c' should map to Chopsticks;
+# 'h' is subtract square played on several heaps.
 playable_games = {'s': SubtractSquareGame,
-                  'c': ChopsticksGame}
+                  'c': ChopsticksGame,
+                  'h': MultiHeapSubtractSquareGame}
 
 # The strategies to implement.
 usable_strategies = {'r': current_strategy,
-                     'i': interactive_strategy}
+                     'i': interactive_strategy,
+                     'm': minimax_strategy,
+                     't': mcts_strategy,
+                     'n': negamax_strategy}
 
 
 class GameInterface:
@@ -41,52 +53,111 @@ class GameInterface:
         self.p1_strategy = p1_strategy
         self.p2_strategy = p2_strategy
 
-    def play(self) -> None:
+    def play(self, instrumentation: Optional[Instrumentation] = None,
+             ponder: bool = False,
+             renderer: Optional[Renderer] = None) -> None:
         """
         Play the game.
+        If instrumentation is given, it records the timings of every move.
+        If ponder is set, a computer playing against interactive_strategy
+        searches its replies while the human is choosing a move.
+        The game is shown through renderer, one write per turn (a default
+        Renderer writing to standard output if None).
         """
         current_state = self.game.current_state
+        if renderer is None:
+            renderer = Renderer()
+
+        # the computer searches its replies while the human is choosing
+        ponderer = None
+        if ponder and ((self.p1_strategy is interactive_strategy) !=
+                       (self.p2_strategy is interactive_strategy)):
+            computer_strategy = self.p1_strategy
+            if computer_strategy is interactive_strategy:
+                computer_strategy = self.p2_strategy
+            ponderer = Ponderer(computer_strategy)
 
-        print("\n" + self.game.get_instructions() + "\n")
-        print(current_state)
+        renderer.line("\n" + self.game.get_instructions() + "\n")
+        renderer.line(current_state)
 
         # Pick moves until the game is over
         while not self.game.is_over(current_state):
             move_to_make = None
 
-            # Print out all of the valid moves
+            # Show the valid moves, summarized if there are many
+            began = time.perf_counter()
             possible_moves = current_state.get_possible_moves()
-            print("The current available moves are:")
-            for move in possible_moves:
-                print(move)
+            get_possible_moves_time = time.perf_counter() - began
+            renderer.moves(possible_moves)
+            renderer.flush()
 
             # Pick a (legal) move.
+            current_strategy = self.p2_strategy
+            if current_state.get_current_player_name() == 'p1':
+                current_strategy = self.p1_strategy
+            if ponderer is not None and \
+                    current_strategy is interactive_strategy:
+                ponderer.start(self.game)
+
+            decision_time = 0.0
+            invalid_retries = -1
             while not current_state.is_valid_move(move_to_make):
-                current_strategy = self.p2_strategy
-                if current_state.get_current_player_name() == 'p1':
-                    current_strategy = self.p1_strategy
-                move_to_make = current_strategy(self.game)
+                began = time.perf_counter()
+                if ponderer is not None and \
+                        current_strategy is ponderer.strategy:
+                    move_to_make = ponderer.reply(self.game)
+                else:
+                    move_to_make = current_strategy(self.game)
+                decision_time += time.perf_counter() - began
+                invalid_retries += 1
+
+            # the human's move is known, so the rest of the search is wasted
+            if ponderer is not None:
+                ponderer.stop()
 
             # Apply the move
             current_player_name = current_state.get_current_player_name()
+            began = time.perf_counter()
             new_game_state = current_state.make_move(move_to_make)
+            make_move_time = time.perf_counter() - began
             self.game.current_state = new_game_state
             current_state = self.game.current_state
 
-            print("{} made the move {}.\n".
-                  format(current_player_name, move_to_make))
-            print(current_state)
+            if instrumentation is not None:
+                instrumentation.record_move(
+                    current_player_name, move_to_make, decision_time,
+                    make_move_time, get_possible_moves_time, invalid_retries)
+
+            renderer.line("{} made the move {}.\n".
+                          format(current_player_name, move_to_make))
+            renderer.line(current_state)
 
-        # Print out the winner of the game
+        # Show the winner of the game
+        winner = None
         if self.game.is_winner("p1"):
-            print("Player 1 is the winner!")
+            winner = 'p1'
+            renderer.line("Player 1 is the winner!")
         elif self.game.is_winner("p2"):
-            print("Player 2 is the winner!")
+            winner = 'p2'
+            renderer.line("Player 2 is the winner!")
         else:
-            print("It's a tie!")
+            renderer.line("It's a tie!")
+        renderer.flush()
+
+        if instrumentation is not None:
+            instrumentation.end_game(winner)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a game.")
+    parser.add_argument('--instrument', metavar='FILE',
+                        help="write per-move timings to FILE as JSON lines")
+    parser.add_argument('--ponder', action='store_true',
+                        help="let the computer think during the human's turn")
+    parser.add_argument('--quiet', action='store_true',
+                        help="do not show the game as it is played")
+    args = parser.parse_args()
+
     games = ", ".join(["'{}': {}".format(key, playable_games[key].__name__) if
                        playable_games[key] is not None else
                        "'{}': None".format(key) for key in playable_games])
@@ -111,5 +182,13 @@ if __name__ == '__main__':
     while p2 not in usable_strategies.keys():
         p2 = input("Select the strategy for Player 2 ({}): ".format(strategies))
 
-    GameInterface(playable_games[chosen_game], usable_strategies[p1],
-                  usable_strategies[p2]).play()
+    interface = GameInterface(playable_games[chosen_game],
+                              usable_strategies[p1], usable_strategies[p2])
+    if args.instrument:
+        with open(args.instrument, 'a') as events:
+            interface.play(Instrumentation([json_lines_hook(events)]),
+                           ponder=args.ponder,
+                           renderer=Renderer(quiet=args.quiet))
+    else:
+        interface.play(ponder=args.ponder,
+                       renderer=Renderer(quiet=args.quiet))
@@ -1,6 +1,343 @@
 """This is the file containing all code relevant to games to be implemented."""
-from typing import Any, List, Union
-import copy
+from typing import Any, Iterator, List, NamedTuple, Tuple, Union
+from collections.abc import Sequence
+from math import isqrt
+
+# Chopsticks moves, in the order get_possible_moves lists them.
+CS_MOVES = ("ll", "lr", "rl", "rr")
+
+# Weight of each hand (in current_value order) in a packed chopsticks state.
+CS_HAND_WEIGHTS = (250, 50, 10, 2)
+
+# The number of packed chopsticks states: four base-5 hands and a turn bit.
+CS_STATE_COUNT = 5 ** 4 * 2
+
+
+class SSCompactState(NamedTuple):
+    """
+    An immutable subtract square position.
+    current_val - the value left to subtract from
+    is_p1_turn - whether p1 is to move
+    """
+    current_val: int
+    is_p1_turn: bool
+
+    def make_move(self, move_to_make: int) -> 'SSCompactState':
+        """
+        Return the position after subtracting move_to_make.
+        >>> SSCompactState(10, True).make_move(9)
+        SSCompactState(current_val=1, is_p1_turn=False)
+        """
+
+        return SSCompactState(self.current_val - move_to_make,
+                              not self.is_p1_turn)
+
+    @property
+    def key(self) -> int:
+        """
+        The position packed into one int: the value, then a turn bit that
+        is set for p1.
+        >>> SSCompactState(10, True).key
+        21
+        """
+
+        return (self.current_val << 1) | self.is_p1_turn
+
+
+class SquareMoves(Sequence):
+    """
+    The squares that can be subtracted from value, in increasing order.
+    Behaves like the list [1, 4, 9, ...] without ever building it, so
+    len, indexing and membership are O(1) however large value is.
+    value - the value to subtract from
+    """
+    __slots__ = ('value', '_count')
+    value: int
+    _count: int
+
+    def __init__(self, value: int) -> None:
+        """
+        Initialize the moves available from value.
+        >>> len(SquareMoves(10 ** 12))
+        1000000
+        >>> SquareMoves(0)
+        []
+        """
+
+        self.value = value
+        self._count = isqrt(value) if value > 0 else 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of squares no larger than value.
+        >>> len(SquareMoves(24))
+        4
+        """
+
+        return self._count
+
+    def __getitem__(self, index: Any) -> Any:
+        """
+        Return the square at index, or a list of the squares in a slice.
+        >>> SquareMoves(10 ** 12)[-1]
+        1000000000000
+        >>> SquareMoves(50)[1:3]
+        [4, 9]
+        """
+
+        if isinstance(index, slice):
+            return [(k + 1) * (k + 1)
+                    for k in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("move index out of range")
+
+        return (index + 1) * (index + 1)
+
+    def __contains__(self, move: Any) -> bool:
+        """
+        Return whether move is a square no larger than value.
+        >>> 999999 ** 2 in SquareMoves(10 ** 12)
+        True
+        >>> 8 in SquareMoves(10)
+        False
+        >>> None in SquareMoves(10)
+        False
+        """
+
+        return (isinstance(move, int) and 0 < move <= self.value
+                and isqrt(move) ** 2 == move)
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Yield the squares in increasing order.
+        >>> list(SquareMoves(10))
+        [1, 4, 9]
+        """
+
+        for k in range(1, self._count + 1):
+            yield k * k
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether self lists the same moves as other, which may also be
+        a list or tuple of moves.
+        >>> SquareMoves(3) == SquareMoves(1)
+        True
+        >>> SquareMoves(4) == [1, 4]
+        True
+        >>> SquareMoves(100) == []
+        False
+        """
+
+        if isinstance(other, SquareMoves):
+            return self._count == other._count
+        if isinstance(other, (list, tuple)):
+            return (self._count == len(other) and
+                    all(a == b for a, b in zip(self, other)))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        """
+        Return the moves written out as a list.
+        >>> SquareMoves(20)
+        [1, 4, 9, 16]
+        """
+
+        return repr(list(self))
+
+
+def cs_pack(hands: List[int], is_p1_turn: bool) -> int:
+    """
+    Return the chopsticks position with hands (in current_value order) and
+    the given player to move, packed into an int: the hands as four base-5
+    digits, followed by a turn bit that is set for p1.
+    >>> cs_pack([0, 0, 0, 0], False)
+    0
+    >>> cs_pack([1, 1, 1, 1], True)
+    313
+    """
+
+    a, b, c, d = hands
+    return ((((a * 5 + b) * 5 + c) * 5 + d) << 1) | int(is_p1_turn)
+
+
+def cs_unpack(code: int) -> Tuple[List[int], bool]:
+    """
+    Return the hands and whether p1 is to move for the packed position code.
+    >>> cs_unpack(313)
+    ([1, 1, 1, 1], True)
+    """
+
+    digits = code >> 1
+    return ([digits // 125, digits // 25 % 5, digits // 5 % 5, digits % 5],
+            bool(code & 1))
+
+
+def _cs_legal_moves(code: int) -> Tuple[str, ...]:
+    """
+    Work out the moves of the player to move in the packed position code.
+    A move uses one of the mover's live hands on one of the opponent's
+    live hands (the left hand counts as live if both are dead).
+    Used to build CS_MOVE_LISTS; call cs_possible_moves instead.
+    """
+
+    hands, is_p1_turn = cs_unpack(code)
+    if is_p1_turn:
+        own_l, own_r, opp_l, opp_r = hands
+    else:
+        opp_l, opp_r, own_l, own_r = hands
+
+    moves = []
+    for own, hand in ((own_l, "l"), (own_r, "r")):
+        if own != 0:
+            if opp_l != 0 or opp_r == 0:
+                moves.append(hand + "l")
+            if opp_r != 0:
+                moves.append(hand + "r")
+
+    return tuple(moves)
+
+
+def _cs_apply(code: int, move_to_make: str) -> int:
+    """
+    Work out the packed position after move_to_make is played from code.
+    Used to build CS_TRANSITIONS; call cs_make_move instead.
+    """
+
+    # the mover's hands come first for p1, and last for p2
+    offset = 0 if code & 1 else 2
+    source = offset + (move_to_make[0] == "r")
+    target = 2 - offset + (move_to_make[1] == "r")
+
+    digits = code >> 1
+    source_weight = CS_HAND_WEIGHTS[source] >> 1
+    target_weight = CS_HAND_WEIGHTS[target] >> 1
+    source_value = digits // source_weight % 5
+    target_value = digits // target_weight % 5
+    new_value = (source_value + target_value) % 5
+
+    return (code + (new_value - target_value) * CS_HAND_WEIGHTS[target]) ^ 1
+
+
+# The index of each move in CS_MOVES.
+CS_MOVE_INDEX = {move: index for index, move in enumerate(CS_MOVES)}
+
+# The legal moves of every packed position, in CS_MOVES order.
+CS_MOVE_LISTS = tuple(_cs_legal_moves(code) for code in range(CS_STATE_COUNT))
+
+# Bit i of CS_LEGAL_MASKS[code] is set if CS_MOVES[i] is legal in code.
+CS_LEGAL_MASKS = tuple(sum(1 << CS_MOVE_INDEX[move] for move in moves)
+                       for moves in CS_MOVE_LISTS)
+
+# CS_TRANSITIONS[code * 4 + i] is the packed position after CS_MOVES[i] is
+# played from code (whether or not the move is legal there, as make_move
+# never checked).
+CS_TRANSITIONS = tuple(_cs_apply(code, move)
+                       for code in range(CS_STATE_COUNT) for move in CS_MOVES)
+
+
+def cs_possible_moves(code: int) -> List[str]:
+    """
+    Return the moves of the player to move in the packed position code.
+    >>> cs_possible_moves(cs_pack([1, 1, 0, 3], True))
+    ['lr', 'rr']
+    >>> cs_possible_moves(cs_pack([1, 1, 0, 3], False))
+    ['rl', 'rr']
+    """
+
+    return list(CS_MOVE_LISTS[code])
+
+
+def cs_is_legal(code: int, move_to_make: Any) -> bool:
+    """
+    Return whether move_to_make is legal in the packed position code.
+    >>> cs_is_legal(cs_pack([1, 1, 0, 3], True), "ll")
+    False
+    >>> cs_is_legal(cs_pack([1, 1, 0, 3], True), "lr")
+    True
+    """
+
+    index = CS_MOVE_INDEX.get(move_to_make)
+    return index is not None and bool(CS_LEGAL_MASKS[code] >> index & 1)
+
+
+def cs_make_move(code: int, move_to_make: str) -> int:
+    """
+    Return the packed position after move_to_make is played from code.
+    >>> cs_unpack(cs_make_move(cs_pack([1, 1, 1, 1], True), "ll"))
+    ([1, 1, 2, 1], False)
+    >>> cs_unpack(cs_make_move(cs_pack([3, 1, 4, 2], False), "rl"))
+    ([0, 1, 4, 2], True)
+    """
+
+    return CS_TRANSITIONS[code * 4 + CS_MOVE_INDEX[move_to_make]]
+
+
+def _cs_swap_hands(code: int, symmetry: int) -> int:
+    """
+    Return the packed position code with p1's hands swapped if bit 0 of
+    symmetry is set, and p2's hands swapped if bit 1 is set.
+    Used to build CS_CANONICAL; call cs_canonical instead.
+    """
+
+    hands, is_p1_turn = cs_unpack(code)
+    if symmetry & 1:
+        hands[0], hands[1] = hands[1], hands[0]
+    if symmetry & 2:
+        hands[2], hands[3] = hands[3], hands[2]
+
+    return cs_pack(hands, is_p1_turn)
+
+
+# CS_SYMMETRY[code] is the hand swap (see _cs_swap_hands) taking code to the
+# smallest position it is equivalent to, which is CS_CANONICAL[code];
+# swapping nothing is preferred when several swaps give that position.
+CS_SYMMETRY = tuple(min(range(4), key=lambda symmetry:
+                        _cs_swap_hands(code, symmetry))
+                    for code in range(CS_STATE_COUNT))
+CS_CANONICAL = tuple(_cs_swap_hands(code, CS_SYMMETRY[code])
+                     for code in range(CS_STATE_COUNT))
+
+
+def cs_canonical(code: int) -> int:
+    """
+    Return the representative of code under swapping either player's left
+    and right hands, which never changes the outcome of a position.
+    >>> cs_unpack(cs_canonical(cs_pack([3, 1, 2, 4], True)))
+    ([1, 3, 2, 4], True)
+    """
+
+    return CS_CANONICAL[code]
+
+
+def cs_orient_move(code: int, move_to_make: str) -> str:
+    """
+    Convert move_to_make between code and its canonical position: a move
+    of either one becomes the matching move of the other, as the hand
+    swaps undo themselves.
+    >>> code = cs_pack([3, 1, 2, 4], True)
+    >>> cs_orient_move(code, "lr")
+    'rr'
+    >>> cs_unpack(cs_make_move(code, "rr"))
+    ([3, 1, 2, 0], False)
+    """
+
+    symmetry = CS_SYMMETRY[code]
+    if not code & 1:
+        # p2 is the mover, so the mover's hands are the ones bit 1 swaps
+        symmetry = (symmetry >> 1) | ((symmetry & 1) << 1)
+
+    own, target = move_to_make
+    if symmetry & 1:
+        own = "r" if own == "l" else "l"
+    if symmetry & 2:
+        target = "r" if target == "l" else "l"
+
+    return own + target
 
 
 class GameCurrentState:
@@ -39,8 +376,40 @@ class GameCurrentState:
         False
         """
 
-        return (type(self) == type(other) and
-                self.is_p1_turn == other.is_p1_turn)
+        return type(self) == type(other) and self.key == other.key
+
+    def __hash__(self) -> int:
+        """
+        Return a hash of the position, so states can be dict keys and set
+        members. Changing a state after using it as a key loses it.
+        >>> len({GameCurrentState(True), GameCurrentState(True)})
+        1
+        """
+
+        return hash(self.key)
+
+    @property
+    def key(self) -> int:
+        """
+        A cheap canonical key of the position: states of the same class
+        are equal exactly when their keys are.
+        >>> GameCurrentState(True).key
+        1
+        """
+
+        return int(self.is_p1_turn)
+
+    @property
+    def canonical_key(self) -> Any:
+        """
+        The key shared by every position that is the same as this one up
+        to a symmetry of the game, for solvers and caches; the same as key
+        for games without symmetries.
+        >>> GameCurrentState(False).canonical_key
+        0
+        """
+
+        return self.key
 
     def __str__(self) -> str:
         """
@@ -93,14 +462,57 @@ class GameCurrentState:
 
         raise NotImplementedError
 
+    def _undo_stack(self) -> List[Any]:
+        """
+        Return the stack push keeps for pop, creating it on first use so
+        make_move never pays for it.
+        """
+
+        try:
+            return self._undo
+        except AttributeError:
+            self._undo: List[Any] = []
+            return self._undo
+
+    def push(self, move_to_make: Union[int, str]) -> None:
+        """
+        Play move_to_make on this state itself, so that pop can take it
+        back; unlike make_move, no new state is made. Subclasses replace
+        this with cheaper versions; this one copies the result of
+        make_move into self.
+        """
+
+        stack = self._undo_stack()
+        saved = dict(vars(self))
+        del saved['_undo']
+        stack.append(move_to_make)
+        stack.append(saved)
+
+        vars(self).update(vars(self.make_move(move_to_make)))
+        self._undo = stack
+
+    def pop(self) -> Union[int, str]:
+        """
+        Take back the last move played by push, and return it.
+        """
+
+        stack = self._undo_stack()
+        saved = stack.pop()
+        move = stack.pop()
+        vars(self).clear()
+        vars(self).update(saved)
+        self._undo = stack
+
+        return move
+
 
 class SSGameCurrentState(GameCurrentState):
     """
     Keeps track of the game subtract square being played.
+    The position itself is held in compact, an SSCompactState.
     """
-    is_p1_turn: bool
-    current_val: int
-    possible_moves_list: List[int]
+    compact: SSCompactState
+    possible_moves_list: SquareMoves
 
     def __init__(self, is_p1_turn: bool, current_val: Union[str, int]) -> None:
         """
@@ -113,13 +525,49 @@ class SSGameCurrentState(GameCurrentState):
         >>> SSGameCurrentState(False, 2).is_p1_turn
         False
         """
-        GameCurrentState.__init__(self, is_p1_turn)
-        self.is_p1_turn = is_p1_turn
-        self.current_val = int(current_val)
+        self.compact = SSCompactState(int(current_val), is_p1_turn)
 
         # Make a list to keep track of the possible moves
         self.possible_moves_list = self.get_possible_moves()
 
+    @classmethod
+    def from_compact(cls, compact: SSCompactState) -> 'SSGameCurrentState':
+        """
+        Return a new state wrapping the position compact.
+        >>> print(SSGameCurrentState.from_compact(SSCompactState(4, False)))
+        p2's turn to move; the current value is 4.
+        """
+
+        state = cls.__new__(cls)
+        state.compact = compact
+        state.possible_moves_list = state.get_possible_moves()
+
+        return state
+
+    @property
+    def is_p1_turn(self) -> bool:
+        """
+        Whether p1 is to move.
+        """
+
+        return self.compact.is_p1_turn
+
+    @is_p1_turn.setter
+    def is_p1_turn(self, is_p1_turn: bool) -> None:
+        self.compact = self.compact._replace(is_p1_turn=is_p1_turn)
+
+    @property
+    def current_val(self) -> int:
+        """
+        The current value of the game.
+        """
+
+        return self.compact.current_val
+
+    @current_val.setter
+    def current_val(self, current_val: int) -> None:
+        self.compact = self.compact._replace(current_val=current_val)
+
     def __eq__(self, other: Any) -> bool:
         """
         Return whether SSGameCurrentState self is equivalent to other.
@@ -130,15 +578,23 @@ class SSGameCurrentState(GameCurrentState):
         True
         >>> gcs1.__eq__(gcs3)
         False
-        >>> gcs2.possible_moves_list = []
-        >>> gcs1 == gcs2
+        >>> gcs1 == SSGameCurrentState(False, 10)
         False
         """
 
-        return (type(self) == type(other) and
-                self.is_p1_turn == other.is_p1_turn and
-                self.current_val == other.current_val and
-                self.possible_moves_list == other.possible_moves_list)
+        return type(self) == type(other) and self.key == other.key
+
+    __hash__ = GameCurrentState.__hash__
+
+    @property
+    def key(self) -> int:
+        """
+        The position packed into one int (see SSCompactState.key).
+        >>> SSGameCurrentState(True, 10).make_move(9).key
+        2
+        """
+
+        return self.compact.key
 
     def __str__(self) -> str:
         """
@@ -152,9 +608,10 @@ class SSGameCurrentState(GameCurrentState):
         return ("{}'s turn to move; the current value is {}.".
                 format(self.get_current_player_name(), str(self.current_val)))
 
-    def get_possible_moves(self) -> List[int]:
+    def get_possible_moves(self) -> SquareMoves:
         """
-        Return a list of possible moves, given the current game state.
+        Return the possible moves, given the current game state.
+        The moves are a lazy SquareMoves view rather than a list.
         >>> SSGameCurrentState(False, 0).get_possible_moves()
         []
         >>> SSGameCurrentState(False, 1).get_possible_moves()
@@ -163,14 +620,7 @@ class SSGameCurrentState(GameCurrentState):
         [1, 4, 9, 16, 25, 36, 49, 64, 81, 100]
         """
 
-        i = 1
-        possible_moves = []
-        while i*i <= self.current_val:
-            possible_moves.append(i*i)
-            i += 1
-
-        # no need to sort this list since it's appended increasingly
-        return possible_moves
+        return SquareMoves(self.current_val)
 
     def is_valid_move(self, move_to_make: int) -> bool:
         """
@@ -181,6 +631,8 @@ class SSGameCurrentState(GameCurrentState):
         False
         >>> SSGameCurrentState(True, 10000).is_valid_move(100)
         True
+        >>> SSGameCurrentState(True, 10 ** 12).is_valid_move(10 ** 12)
+        True
         """
 
         return move_to_make in self.possible_moves_list
@@ -196,27 +648,49 @@ class SSGameCurrentState(GameCurrentState):
         [1, 4, 9, 16, 25, 36]
         """
 
-        copied = copy.deepcopy(self)
+        # the compact position builds the next one, and the wrapper
+        # refreshes the possible moves list for the other player
+        return type(self).from_compact(self.compact.make_move(move_to_make))
 
-        # change player turn (since the game is sequential)
-        copied.is_p1_turn = not copied.is_p1_turn
+    def push(self, move_to_make: int) -> None:
+        """
+        Subtract move_to_make from this state itself; pop adds it back.
+        >>> state = SSGameCurrentState(True, 10)
+        >>> state.push(9)
+        >>> print(state)
+        p2's turn to move; the current value is 1.
+        >>> state.pop()
+        9
+        >>> print(state)
+        p1's turn to move; the current value is 10.
+        """
 
-        # change the current value of the subtract square
-        copied.current_val -= move_to_make
+        self._undo_stack().append(move_to_make)
+        self.compact = SSCompactState(self.compact.current_val - move_to_make,
+                                      not self.compact.is_p1_turn)
+        self.possible_moves_list = self.get_possible_moves()
 
-        # "refresh" the possible moves list for the other player
-        copied.possible_moves_list = copied.get_possible_moves()
+    def pop(self) -> int:
+        """
+        Take back the last move played by push, and return it.
+        """
 
-        return copied
+        move = self._undo_stack().pop()
+        self.compact = SSCompactState(self.compact.current_val + move,
+                                      not self.compact.is_p1_turn)
+        self.possible_moves_list = self.get_possible_moves()
+
+        return move
 
 
 class CSGameCurrentState(GameCurrentState):
     """
     Keeps track of the game chopsticks being played.
+    The position itself is held in code, packed by cs_pack.
     """
-    is_p1_turn: bool
-    current_val: List[int]
-    possible_moves_list: List[str]
+    code: int
+    possible_moves_p1: List[str]
+    possible_moves_p2: List[str]
 
     def __init__(self, is_p1_turn: bool) -> None:
         """
@@ -229,10 +703,8 @@ class CSGameCurrentState(GameCurrentState):
         >>> CSGameCurrentState(False).is_p1_turn
         False
         """
-        self.is_p1_turn = is_p1_turn
-
         # both players start with 1 on both hands
-        self.current_value = [1, 1, 1, 1]
+        self.code = cs_pack([1, 1, 1, 1], is_p1_turn)
 
         # Make lists to keep track of the possible moves
         self.possible_moves_p1 = ["ll", "lr", "rl", "rr"]
@@ -250,13 +722,58 @@ class CSGameCurrentState(GameCurrentState):
         False
         """
 
-        return (type(self) == type(other) and
-                self.is_p1_turn == other.is_p1_turn and
-                self.current_value == other.current_value and
-                sorted(self.possible_moves_p1)
-                == sorted(other.possible_moves_p1) and
-                sorted(self.possible_moves_p2)
-                == sorted(other.possible_moves_p2))
+        return type(self) == type(other) and self.code == other.code
+
+    __hash__ = GameCurrentState.__hash__
+
+    @property
+    def key(self) -> int:
+        """
+        The packed position (see cs_pack), which make_move updates with a
+        single table lookup.
+        >>> CSGameCurrentState(True).key
+        313
+        """
+
+        return self.code
+
+    @property
+    def canonical_key(self) -> int:
+        """
+        The packed position of the representative of this position under
+        swapping either player's hands (see cs_canonical).
+        >>> left = CSGameCurrentState(True).make_move("ll")
+        >>> right = CSGameCurrentState(True).make_move("lr")
+        >>> left == right, left.canonical_key == right.canonical_key
+        (False, True)
+        """
+
+        return CS_CANONICAL[self.code]
+
+    @property
+    def is_p1_turn(self) -> bool:
+        """
+        Whether p1 is to move.
+        """
+
+        return bool(self.code & 1)
+
+    @is_p1_turn.setter
+    def is_p1_turn(self, is_p1_turn: bool) -> None:
+        self.code = (self.code & ~1) | int(is_p1_turn)
+
+    @property
+    def current_value(self) -> List[int]:
+        """
+        The hands of p1 (left, right) and then p2 (left, right).
+        Assign a new list to change them; the list returned is a copy.
+        """
+
+        return cs_unpack(self.code)[0]
+
+    @current_value.setter
+    def current_value(self, current_value: List[int]) -> None:
+        self.code = cs_pack(current_value, bool(self.code & 1))
 
     def __str__(self) -> str:
         """
@@ -266,10 +783,7 @@ class CSGameCurrentState(GameCurrentState):
         """
 
         # values of each hand
-        p1_l = self.current_value[0]
-        p1_r = self.current_value[1]
-        p2_l = self.current_value[2]
-        p2_r = self.current_value[3]
+        p1_l, p1_r, p2_l, p2_r = self.current_value
 
         if self.is_p1_turn:
             return ("Player 1 [Current]: {}-{}; Player 2: {}-{}"
@@ -284,62 +798,7 @@ class CSGameCurrentState(GameCurrentState):
         ['ll', 'lr', 'rl', 'rr']
         """
 
-        # value of each hand
-        p1_l = self.current_value[0]
-        p1_r = self.current_value[1]
-        p2_l = self.current_value[2]
-        p2_r = self.current_value[3]
-
-        if self.get_current_player_name() == 'p1':
-            if p1_l != 0 and p1_r != 0:
-                if p2_l != 0 and p2_r != 0:
-                    moves = ["ll", "lr", "rl", "rr"]
-                elif p2_l == 0 and p2_r != 0:
-                    moves = ["lr", "rr"]
-                else:
-                    moves = ["ll", "rl"]
-            elif p1_l == 0 and p1_r != 0:
-                if p2_l != 0 and p2_r != 0:
-                    moves = ["rl", "rr"]
-                elif p2_l == 0 and p2_r != 0:
-                    moves = ["rr"]
-                else:
-                    moves = ["rl"]
-            elif p1_l != 0 and p1_r == 0:
-                if p2_l != 0 and p2_r != 0:
-                    moves = ["ll", "lr"]
-                elif p2_l == 0 and p2_r != 0:
-                    moves = ["lr"]
-                else:
-                    moves = ["ll"]
-            else:
-                moves = []
-        else:
-            if p2_l != 0 and p2_r != 0:
-                if p1_l != 0 and p1_r != 0:
-                    moves = ["ll", "lr", "rl", "rr"]
-                elif p1_l == 0 and p1_r != 0:
-                    moves = ["lr", "rr"]
-                else:
-                    moves = ["ll", "rl"]
-            elif p2_l == 0 and p2_r != 0:
-                if p1_l != 0 and p1_r != 0:
-                    moves = ["rl", "rr"]
-                elif p1_l == 0 and p1_r != 0:
-                    moves = ["rr"]
-                else:
-                    moves = ["rl"]
-            elif p2_l != 0 and p2_r == 0:
-                if p1_l != 0 and p1_r != 0:
-                    moves = ["ll", "lr"]
-                elif p1_l == 0 and p1_r != 0:
-                    moves = ["lr"]
-                else:
-                    moves = ["ll"]
-            else:
-                moves = []
-
-        return moves
+        return cs_possible_moves(self.code)
 
     def is_valid_move(self, move_to_make: str) -> bool:
         """
@@ -350,7 +809,7 @@ class CSGameCurrentState(GameCurrentState):
         False
         """
 
-        return move_to_make in self.get_possible_moves()
+        return cs_is_legal(self.code, move_to_make)
 
     def make_move(self, move_to_make: str) -> Any:
         """
@@ -360,43 +819,10 @@ class CSGameCurrentState(GameCurrentState):
         Player 1: 1-1; Player 2 [Current]: 2-1
         """
 
-        copied = copy.deepcopy(self)
-        # values of each hand
-        p1_l = copied.current_value[0]
-        p1_r = copied.current_value[1]
-        p2_l = copied.current_value[2]
-        p2_r = copied.current_value[3]
-
-        # change the current positions of opposing player
-        if copied.get_current_player_name() == 'p1':
-            if move_to_make == "ll":
-                # assign p2_1
-                copied.current_value = [p1_l, p1_r, (p1_l + p2_l) % 5, p2_r]
-            elif move_to_make == "lr":
-                # assign p2_r
-                copied.current_value = [p1_l, p1_r, p2_l, (p1_l + p2_r) % 5]
-            elif move_to_make == "rl":
-                # assign p2_1
-                copied.current_value = [p1_l, p1_r, (p1_r + p2_l) % 5, p2_r]
-            else:
-                # assign p2_r
-                copied.current_value = [p1_l, p1_r, p2_l, (p1_r + p2_r) % 5]
-        else:
-            if move_to_make == "ll":
-                # assign p1_1
-                copied.current_value = [(p2_l + p1_l) % 5, p1_r, p2_l, p2_r]
-            elif move_to_make == "lr":
-                # assign p1_r
-                copied.current_value = [p1_l, (p2_l + p1_r) % 5, p2_l, p2_r]
-            elif move_to_make == "rl":
-                # assign p1_1
-                copied.current_value = [(p2_r + p1_l) % 5, p1_r, p2_l, p2_r]
-            else:
-                # assign p1_r
-                copied.current_value = [p1_l, (p2_r + p1_r) % 5, p2_l, p2_r]
-
-        # change player's turn (since the game is sequential)
-        copied.is_p1_turn = not copied.is_p1_turn
+        copied = type(self).__new__(type(self))
+        copied.code = cs_make_move(self.code, move_to_make)
+        copied.possible_moves_p1 = self.possible_moves_p1
+        copied.possible_moves_p2 = self.possible_moves_p2
 
         # "refresh" the possible moves list
         if copied.get_current_player_name() == 'p1':
@@ -406,6 +832,37 @@ class CSGameCurrentState(GameCurrentState):
 
         return copied
 
+    def push(self, move_to_make: str) -> None:
+        """
+        Play move_to_make on this state itself with one table lookup; pop
+        takes it back. No new state object is created, and
+        possible_moves_p1 and possible_moves_p2 are left as they were.
+        >>> state = CSGameCurrentState(True)
+        >>> state.push("ll")
+        >>> print(state)
+        Player 1: 1-1; Player 2 [Current]: 2-1
+        >>> state.pop()
+        'll'
+        >>> state == CSGameCurrentState(True)
+        True
+        """
+
+        stack = self._undo_stack()
+        stack.append(self.code)
+        stack.append(move_to_make)
+        self.code = CS_TRANSITIONS[self.code * 4 + CS_MOVE_INDEX[move_to_make]]
+
+    def pop(self) -> str:
+        """
+        Take back the last move played by push, and return it.
+        """
+
+        stack = self._undo_stack()
+        move = stack.pop()
+        self.code = stack.pop()
+
+        return move
+
 
 class Game:
     """
@@ -516,14 +973,20 @@ class SubtractSquareGame(Game):
         "alternate between the two players until no movees are "
         "possible. Whoever is about to play at that point loses!")
 
-    def __init__(self, is_p1_turn: bool) -> None:
+    def __init__(self, is_p1_turn: bool,
+                 starting_num: Union[str, int, None] = None) -> None:
         """
         Initialize the subtract square game;
         set which player (1 or 2) should move first.
+        The player is asked for the starting value unless starting_num
+        is given.
+        >>> print(SubtractSquareGame(True, 10).current_state)
+        p1's turn to move; the current value is 10.
         """
 
         self.is_p1_turn = is_p1_turn
-        starting_num = self.initial_input()
+        if starting_num is None:
+            starting_num = self.initial_input()
         self.current_state = SSGameCurrentState(self.is_p1_turn, starting_num)
 
     def __eq__(self, other: Any) -> bool:
@@ -0,0 +1,181 @@
+"""
+Opt-in per-move instrumentation for GameInterface.play.
+
+An Instrumentation receives one event per move with the time spent in the
+strategy, in make_move and in get_possible_moves, the number of invalid
+moves the strategy tried first, and the resident memory. Events are passed
+to hooks (e.g. json_lines_hook) as they happen, and a p50/p95/p99 summary
+is produced when the game ends.
+"""
+from typing import Any, Callable, Dict, IO, List, Optional
+import json
+import os
+
+# The timings kept for the end-of-game summary.
+TIMINGS = ('decision_time', 'make_move_time', 'get_possible_moves_time')
+
+# The percentiles reported in the end-of-game summary.
+PERCENTILES = (50, 95, 99)
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    _PAGE_SIZE = None
+
+
+def resident_memory() -> Optional[int]:
+    """
+    Return the resident memory of this process in bytes, or None if it
+    cannot be read on this platform.
+    >>> resident_memory() is None or resident_memory() > 0
+    True
+    """
+
+    if _PAGE_SIZE is not None:
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        return None
+    # ru_maxrss is the peak rather than the current size, in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Return the q-th percentile of values (nearest rank).
+    >>> percentile([4, 1, 3, 2], 50)
+    2
+    >>> percentile([4, 1, 3, 2], 99)
+    4
+    """
+
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def json_lines_hook(output: IO[str]) -> Callable[[Dict[str, Any]], None]:
+    """
+    Return a hook that writes each event to output as a line of JSON.
+    >>> import io
+    >>> output = io.StringIO()
+    >>> json_lines_hook(output)({'event': 'move', 'move': 'll'})
+    >>> output.getvalue()
+    '{"event": "move", "move": "ll"}\\n'
+    """
+
+    def hook(event: Dict[str, Any]) -> None:
+        output.write(json.dumps(event) + "\n")
+        output.flush()
+
+    return hook
+
+
+class Instrumentation:
+    """
+    Collects the per-move measurements of a game.
+    hooks - called with every event as it happens
+    samples - every value of each of TIMINGS so far, for the summary
+    retries - the number of invalid moves tried before each move
+    moves - the number of moves recorded
+    """
+    hooks: List[Callable[[Dict[str, Any]], None]]
+    samples: Dict[str, List[float]]
+    retries: List[int]
+    moves: int
+
+    def __init__(self, hooks: Optional[List[Callable[[Dict[str, Any]],
+                                                     None]]] = None) -> None:
+        """
+        Initialize an Instrumentation that passes events to hooks.
+        """
+
+        self.hooks = list(hooks or [])
+        self.samples = {timing: [] for timing in TIMINGS}
+        self.retries = []
+        self.moves = 0
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        """
+        Pass event to every hook.
+        """
+
+        for hook in self.hooks:
+            hook(event)
+
+    def record_move(self, player: str, move: Any, decision_time: float,
+                    make_move_time: float, get_possible_moves_time: float,
+                    invalid_retries: int) -> None:
+        """
+        Record one move made by player, with its timings in seconds.
+        >>> instrumentation = Instrumentation()
+        >>> instrumentation.record_move('p1', 4, 0.5, 0.1, 0.2, 1)
+        >>> instrumentation.samples['decision_time']
+        [0.5]
+        """
+
+        self.moves += 1
+        self.samples['decision_time'].append(decision_time)
+        self.samples['make_move_time'].append(make_move_time)
+        self.samples['get_possible_moves_time'].append(
+            get_possible_moves_time)
+        self.retries.append(invalid_retries)
+
+        if isinstance(move, (int, str)):
+            move_value = move
+        else:
+            move_value = str(move)
+        self._emit({'event': 'move',
+                    'move_number': self.moves,
+                    'player': player,
+                    'move': move_value,
+                    'decision_time': decision_time,
+                    'make_move_time': make_move_time,
+                    'get_possible_moves_time': get_possible_moves_time,
+                    'invalid_retries': invalid_retries,
+                    'rss_bytes': resident_memory()})
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return the p50/p95/p99 and maximum of each timing, and the total
+        number of invalid moves tried.
+        >>> instrumentation = Instrumentation()
+        >>> for i in range(1, 101):
+        ...     instrumentation.record_move('p1', i, i, 0, 0, 0)
+        >>> summary = instrumentation.summary()['decision_time']
+        >>> summary['p50'], summary['p95'], summary['p99'], summary['max']
+        (50, 95, 99, 100)
+        """
+
+        result = {'moves': self.moves,
+                  'invalid_retries': sum(self.retries)}
+        for timing, values in self.samples.items():
+            if not values:
+                continue
+            stats = {'p{}'.format(q): percentile(values, q)
+                     for q in PERCENTILES}
+            stats['max'] = max(values)
+            stats['total'] = sum(values)
+            result[timing] = stats
+
+        return result
+
+    def end_game(self, winner: Optional[str]) -> Dict[str, Any]:
+        """
+        Record the end of the game won by winner ('p1', 'p2' or None for a
+        tie), and return the summary passed to the hooks.
+        """
+
+        summary = self.summary()
+        self._emit({'event': 'game_end',
+                    'winner': winner,
+                    'rss_bytes': resident_memory(),
+                    'summary': summary})
+
+        return summary
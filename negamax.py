@@ -0,0 +1,272 @@
+"""
+Negamax search for subtract square values too large to tabulate.
+
+Values no larger than the table limit are looked up in the shared table of
+solvers.py; above it, SSNegamax searches the largest squares first, as
+they lead straight back into the table, and remembers solved values in an
+LRUCache whose size is bounded by entries or bytes, so a long-running
+process keeps a flat memory footprint.
+"""
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+from math import isqrt
+import sys
+from solvers import WIN, DRAW, LOSS
+from solvers import ss_is_winning, ss_best_move, ss_quick_limit
+from cancel import check_cancelled, CHECK_INTERVAL
+
+# Default number of values SSNegamax remembers.
+MEMO_ENTRIES = 100000
+
+# Default search depth (in plies above the table) and nodes per search.
+MAX_DEPTH = 4
+NODE_BUDGET = 100000
+
+# Bytes an OrderedDict entry costs beyond its key and value.
+_ENTRY_OVERHEAD = 100
+
+
+class LRUCache:
+    """
+    A mapping that forgets the least recently used entries beyond a budget.
+    max_entries - the most entries kept, or None for no limit
+    max_bytes - the most bytes (estimated) kept, or None for no limit
+    size_bytes - the estimated bytes of the entries kept
+    hits - the number of get calls that found their key
+    misses - the number of get calls that did not
+    evictions - the number of entries forgotten to stay within budget
+    """
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    size_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    _entries: 'OrderedDict[Any, Any]'
+
+    def __init__(self, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None) -> None:
+        """
+        Initialize an empty cache with the given budgets.
+        >>> cache = LRUCache(max_entries=2)
+        >>> cache.put(1, 'a'); cache.put(2, 'b')
+        >>> cache.get(1)
+        'a'
+        >>> cache.put(3, 'c')
+        >>> cache.get(2) is None, len(cache), cache.evictions
+        (True, 2, 1)
+        """
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Any) -> bool:
+        """
+        Return whether key is kept, without counting a hit or a miss or
+        making it recently used.
+        """
+
+        return key in self._entries
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Return the value of key, making it the most recently used, or
+        default if it is not kept.
+        """
+
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """
+        Keep value for key as the most recently used entry, forgetting the
+        least recently used ones while over budget.
+        >>> cache = LRUCache(max_bytes=1000)
+        >>> for key in range(100):
+        ...     cache.put(key, key)
+        >>> cache.size_bytes <= 1000 and cache.evictions > 0
+        True
+        """
+
+        if key in self._entries:
+            self.size_bytes -= _entry_size(key, self._entries.pop(key))
+        self._entries[key] = value
+        self.size_bytes += _entry_size(key, value)
+
+        while self._entries and (
+                (self.max_entries is not None and
+                 len(self._entries) > self.max_entries) or
+                (self.max_bytes is not None and
+                 self.size_bytes > self.max_bytes)):
+            old_key, old_value = self._entries.popitem(last=False)
+            self.size_bytes -= _entry_size(old_key, old_value)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Forget every entry; the counts are kept.
+        """
+
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the size and counts of the cache.
+        >>> LRUCache(max_entries=10).stats()['entries']
+        0
+        """
+
+        return {'entries': len(self._entries),
+                'bytes': self.size_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+def _entry_size(key: Any, value: Any) -> int:
+    """
+    Return the estimated bytes an entry of key and value takes.
+    """
+
+    return sys.getsizeof(key) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+
+
+class SSNegamax:
+    """
+    A negamax search of subtract square above the table limit.
+    memo - the outcomes of values solved so far
+    table_limit - values up to this are looked up in the shared table, or
+                  None to look up every value up to ss_quick_limit()
+    limit - the table limit of the current search
+    max_depth - how many plies above the table a search goes
+    node_budget - the most values a search visits
+    nodes - the number of values the last search visited
+    Outcomes are WIN or LOSS when proven, and DRAW when the search ran out
+    of depth or nodes before proving either.
+    """
+    memo: LRUCache
+    table_limit: Optional[int]
+    limit: int
+    max_depth: int
+    node_budget: int
+    nodes: int
+
+    def __init__(self, max_entries: Optional[int] = MEMO_ENTRIES,
+                 max_bytes: Optional[int] = None,
+                 table_limit: Optional[int] = None,
+                 max_depth: int = MAX_DEPTH,
+                 node_budget: int = NODE_BUDGET) -> None:
+        """
+        Initialize a search whose memo keeps at most max_entries values
+        and max_bytes bytes.
+        >>> search = SSNegamax(table_limit=1000)
+        >>> search.outcome(10 ** 6) == WIN
+        True
+        """
+
+        self.memo = LRUCache(max_entries, max_bytes)
+        self.table_limit = table_limit
+        self.limit = 0
+        self.max_depth = max_depth
+        self.node_budget = node_budget
+        self.nodes = 0
+
+    def outcome(self, value: int) -> int:
+        """
+        Return the outcome of value for the player to move.
+        """
+
+        self._start()
+        return self._search(value, self.max_depth)
+
+    def _start(self) -> None:
+        """
+        Reset the node count and fix the table limit for a new search.
+        """
+
+        self.nodes = 0
+        self.limit = (self.table_limit if self.table_limit is not None
+                      else ss_quick_limit())
+
+    def _search(self, value: int, depth: int) -> int:
+        """
+        Return the outcome of value, searching at most depth plies above
+        the table. Only proven outcomes are remembered.
+        """
+
+        if value <= self.limit:
+            return WIN if ss_is_winning(value) else LOSS
+
+        known = self.memo.get(value)
+        if known is not None:
+            return known
+        if depth == 0:
+            return DRAW
+
+        best = LOSS
+        # the largest squares leave the smallest values, which are the
+        # quickest to prove (and a single lost reply proves a win)
+        for root in range(isqrt(value), 0, -1):
+            if self.nodes >= self.node_budget:
+                return DRAW
+            self.nodes += 1
+            if self.nodes % CHECK_INTERVAL == 0:
+                check_cancelled()
+            result = -self._search(value - root * root, depth - 1)
+            if result == WIN:
+                self.memo.put(value, WIN)
+                return WIN
+            best = max(best, result)
+
+        if best == LOSS:
+            self.memo.put(value, LOSS)
+        return best
+
+    def best_move(self, value: int) -> Optional[int]:
+        """
+        Return a square that leaves the opponent lost, trying the largest
+        first; failing that one whose outcome is unproven, or 1 if value is
+        lost. Return None at 0.
+        >>> search = SSNegamax(table_limit=1000)
+        >>> square = search.best_move(10 ** 14 + 7)
+        >>> search.outcome(10 ** 14 + 7 - square) == LOSS
+        True
+        """
+
+        if value <= 0:
+            return None
+        self._start()
+        if value <= self.limit:
+            move = ss_best_move(value)
+            return move if move is not None else 1
+
+        unproven = None
+        for root in range(isqrt(value), 0, -1):
+            if self.nodes >= self.node_budget:
+                break
+            self.nodes += 1
+            if self.nodes % CHECK_INTERVAL == 0:
+                check_cancelled()
+            result = self._search(value - root * root, self.max_depth - 1)
+            if result == LOSS:
+                return root * root
+            if result == DRAW and unproven is None:
+                unproven = root * root
+
+        return unproven if unproven is not None else 1
@@ -0,0 +1,140 @@
+"""
+Think about the computer's replies while a human is choosing a move.
+
+A Ponderer runs the computer's strategy in a background thread on the
+position after each of the human's possible moves and keeps the replies,
+so when the human's move is known the computer can answer at once. The
+thread's searches are cancelled as soon as the human moves.
+"""
+from typing import Any, Callable, Dict, Optional
+import copy
+import threading
+from games import Game
+from strategy import state_key
+from cancel import SearchCancelled, cancel_searches_on
+
+# The most of the human's moves pondered each turn, taken in the order
+# get_possible_moves lists them.
+MAX_PONDER_MOVES = 64
+
+
+class Ponderer:
+    """
+    Searches the replies of strategy in the background.
+    strategy - the computer's strategy
+    max_moves - the most of the human's moves pondered each turn
+    replies - the moves strategy picked, by the state_key of the position
+    hits - the number of replies answered from replies
+    misses - the number of replies that had to be searched after all
+    """
+    strategy: Callable[[Any], Any]
+    max_moves: int
+    replies: Dict[Any, Any]
+    hits: int
+    misses: int
+    _stop: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, strategy: Callable[[Any], Any],
+                 max_moves: int = MAX_PONDER_MOVES) -> None:
+        """
+        Initialize a Ponderer for strategy that is not pondering yet.
+        >>> from strategy import minimax_strategy
+        >>> from games import SubtractSquareGame
+        >>> game = SubtractSquareGame(True, 20)
+        >>> ponderer = Ponderer(minimax_strategy)
+        >>> ponderer.start(game)
+        >>> ponderer.wait()
+        >>> game.current_state = game.current_state.make_move(4)
+        >>> ponderer.reply(game) == minimax_strategy(game), ponderer.hits
+        (True, 1)
+        """
+
+        self.strategy = strategy
+        self.max_moves = max_moves
+        self.replies = {}
+        self.hits = 0
+        self.misses = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, game: Game) -> None:
+        """
+        Start pondering the replies to the moves of the player to move in
+        game, forgetting the replies of earlier turns.
+        """
+
+        self.stop()
+        self.replies = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._ponder, args=(copy.copy(game), self._stop),
+            daemon=True)
+        self._thread.start()
+
+    def _ponder(self, game: Game, stop: threading.Event) -> None:
+        """
+        Store the reply of strategy after each move in game until every
+        move has been tried or stop is set; setting stop also cancels the
+        strategy call in progress. Runs in the background thread.
+        """
+
+        cancel_searches_on(stop)
+        state = game.current_state
+        try:
+            for number, move in enumerate(state.get_possible_moves()):
+                if number == self.max_moves or stop.is_set():
+                    return
+                game.current_state = state.make_move(move)
+                if not game.is_over(game.current_state):
+                    self.replies[state_key(game.current_state)] = \
+                        self.strategy(game)
+        except SearchCancelled:
+            return
+
+    def wait(self) -> None:
+        """
+        Wait until the background thread has pondered every move.
+        """
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stop(self) -> None:
+        """
+        Cancel the background thread's search and wait for it to end,
+        since strategies keep state that must not be used by two threads
+        at once. Searches check for cancellation every few thousand steps,
+        so this returns promptly; only a table being built in bulk (e.g.
+        the subtract square table) is finished first, and the reply needs
+        that table anyway.
+        >>> import time
+        >>> from strategy import make_mcts_strategy
+        >>> from games import ChopsticksGame
+        >>> ponderer = Ponderer(make_mcts_strategy(time_budget=10))
+        >>> ponderer.start(ChopsticksGame(True))
+        >>> time.sleep(0.2)
+        >>> began = time.perf_counter()
+        >>> ponderer.stop()
+        >>> time.perf_counter() - began < 1
+        True
+        """
+
+        self._stop.set()
+        self.wait()
+
+    def reply(self, game: Game) -> Any:
+        """
+        Return the move strategy picks in game, from the pondered replies
+        if there is one and by searching otherwise.
+        """
+
+        self.stop()
+        key = state_key(game.current_state)
+        if key in self.replies:
+            self.hits += 1
+            return self.replies.pop(key)
+
+        self.misses += 1
+        return self.strategy(game)
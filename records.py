@@ -0,0 +1,352 @@
+"""
+A compact binary format for archiving played games.
+
+File layout:
+    header - 4-byte magic b'GREC', uint16 version (little-endian), 10 bytes
+             spare
+    body   - the games, one after another:
+             1 byte the game: b's' (subtract square) or b'c' (chopsticks)
+             1 byte flags: bit 0 set if p1 moved first, bits 1-2 the winner
+                    (0 for none, 1 for p1, 2 for p2)
+             varint the starting value (subtract square only)
+             varint the number of moves
+             the moves packed into width bits each, least significant bits
+             first, padded to a whole byte
+
+Chopsticks moves are their index in CS_MOVES (2 bits each); subtract
+square moves are stored as their square root less one, in just enough bits
+for the largest root of the starting value. Varints are unsigned LEB128.
+
+RecordWriter appends games through a buffer, and read_records yields them
+one at a time, so an archive of millions of games is never held in memory.
+"""
+from typing import Any, IO, Iterator, List, NamedTuple, Optional, Sequence
+from math import isqrt
+import os
+import struct
+from games import CS_MOVES, CS_MOVE_INDEX, GameCurrentState
+from games import SSGameCurrentState, CSGameCurrentState
+
+MAGIC = b'GREC'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sH10x')
+
+# The games a record can hold, by their key in playable_games.
+RECORD_GAMES = ('s', 'c')
+
+# Winners as stored in bits 1-2 of a record's flags.
+_WINNER_CODES = {None: 0, 'p1': 1, 'p2': 2}
+_WINNERS = {code: winner for winner, code in _WINNER_CODES.items()}
+
+# Bytes RecordWriter collects before writing them out.
+BUFFER_SIZE = 1 << 16
+
+# Bytes read_records reads from the file at a time.
+_READ_SIZE = 1 << 16
+
+
+class GameRecord(NamedTuple):
+    """
+    One archived game.
+    game_key - 's' for subtract square or 'c' for chopsticks
+    start - the starting value (0 for chopsticks)
+    is_p1_turn - whether p1 moved first
+    moves - the moves made, in order
+    winner - 'p1', 'p2', or None if the game was unfinished or drawn
+    """
+    game_key: str
+    start: int
+    is_p1_turn: bool
+    moves: Sequence[Any]
+    winner: Optional[str] = None
+
+
+def move_width(game_key: str, start: int) -> int:
+    """
+    Return the bits each move of a game takes.
+    >>> move_width('c', 0), move_width('s', 3), move_width('s', 100)
+    (2, 0, 4)
+    >>> move_width('s', 10 ** 12)
+    20
+    """
+
+    if game_key == 'c':
+        return 2
+    return max(isqrt(start) - 1, 0).bit_length()
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    """
+    Append value to out as an unsigned LEB128 varint.
+    >>> out = bytearray()
+    >>> _write_varint(out, 300)
+    >>> bytes(out)
+    b'\\xac\\x02'
+    """
+
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_record(record: GameRecord) -> bytes:
+    """
+    Return record in the body format.
+    >>> encode_record(GameRecord('c', 0, True, ['ll', 'rr', 'lr'], 'p1'))
+    b'c\\x03\\x03\\x1c'
+    >>> len(encode_record(GameRecord('s', 10 ** 12, True, [10 ** 12])))
+    12
+    """
+
+    if record.game_key not in RECORD_GAMES:
+        raise ValueError("cannot record game {}".format(record.game_key))
+    if record.start < 0:
+        raise ValueError("the start must not be negative")
+
+    out = bytearray(record.game_key.encode())
+    out.append(bool(record.is_p1_turn) | _WINNER_CODES[record.winner] << 1)
+    if record.game_key == 's':
+        _write_varint(out, record.start)
+    _write_varint(out, len(record.moves))
+
+    width = move_width(record.game_key, record.start)
+    packed = 0
+    for number, move in enumerate(record.moves):
+        if record.game_key == 'c':
+            code = CS_MOVE_INDEX[move]
+        else:
+            root = isqrt(move) if move > 0 else 0
+            code = root - 1
+            if root * root != move or code < 0 or code >> width:
+                raise ValueError("cannot record the move {} from {}".format(
+                    move, record.start))
+        packed |= code << (number * width)
+    out += packed.to_bytes((len(record.moves) * width + 7) // 8, 'little')
+
+    return bytes(out)
+
+
+class RecordWriter:
+    """
+    Appends games to a record file through a buffer.
+    path - the file the games are appended to
+    games - the number of games appended by this writer
+    """
+    path: str
+    games: int
+    _file: IO[bytes]
+    _buffer: bytearray
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the record file at path for appending, creating it if there
+        is none.
+        """
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            _check_header(path)
+
+        self.path = path
+        self.games = 0
+        self._buffer = bytearray()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(_HEADER.pack(MAGIC, VERSION))
+
+    def append(self, record: GameRecord) -> None:
+        """
+        Add record to the end of the file.
+        """
+
+        self.append_encoded(encode_record(record))
+        self.games += 1
+
+    def append_encoded(self, records: bytes) -> None:
+        """
+        Add records already encoded by encode_record, e.g. by a worker
+        process, to the end of the file.
+        """
+
+        self._buffer += records
+        if len(self._buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write out the buffered games.
+        """
+
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        Write out the buffered games and close the file.
+        """
+
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _check_header(path: str) -> None:
+    """
+    Raise a ValueError unless path starts with a record file header.
+    """
+
+    with open(path, 'rb') as record_file:
+        header = record_file.read(_HEADER.size)
+    if len(header) < _HEADER.size or \
+            _HEADER.unpack(header) != (MAGIC, VERSION):
+        raise ValueError("{} is not a game record file".format(path))
+
+
+class _ByteStream:
+    """
+    Bytes read from a file in large blocks.
+    _file - the file being read
+    _data - the block being read
+    _offset - the position of the next byte in _data
+    """
+    _file: IO[bytes]
+    _data: bytes
+    _offset: int
+
+    def __init__(self, record_file: IO[bytes]) -> None:
+        """
+        Initialize a stream reading record_file from where it is.
+        """
+
+        self._file = record_file
+        self._data = b''
+        self._offset = 0
+
+    def at_end(self) -> bool:
+        """
+        Return whether every byte has been read.
+        """
+
+        if self._offset < len(self._data):
+            return False
+        self._data = self._file.read(_READ_SIZE)
+        self._offset = 0
+        return not self._data
+
+    def read(self, size: int) -> bytes:
+        """
+        Return the next size bytes, raising a ValueError if the file ends
+        first.
+        """
+
+        end = self._offset + size
+        if end > len(self._data):
+            self._data = self._data[self._offset:] + \
+                self._file.read(max(size, _READ_SIZE))
+            self._offset, end = 0, size
+            if end > len(self._data):
+                raise ValueError("the record file ends in the middle of "
+                                 "a game")
+        chunk = self._data[self._offset:end]
+        self._offset = end
+        return chunk
+
+    def read_varint(self) -> int:
+        """
+        Return the next unsigned LEB128 varint.
+        """
+
+        value = shift = 0
+        while True:
+            byte = self.read(1)[0]
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+
+def read_records(path: str) -> Iterator[GameRecord]:
+    """
+    Yield the games of the record file at path, in order, reading it a
+    block at a time.
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'games.rec')
+    >>> with RecordWriter(path) as writer:
+    ...     writer.append(GameRecord('s', 10, True, [9, 1], 'p2'))
+    ...     writer.append(GameRecord('c', 0, False, ['rl']))
+    >>> for record in read_records(path):
+    ...     print(record)
+    GameRecord(game_key='s', start=10, is_p1_turn=True, moves=[9, 1], \
+winner='p2')
+    GameRecord(game_key='c', start=0, is_p1_turn=False, moves=['rl'], \
+winner=None)
+    """
+
+    _check_header(path)
+    with open(path, 'rb') as record_file:
+        record_file.seek(_HEADER.size)
+        stream = _ByteStream(record_file)
+
+        while not stream.at_end():
+            game_key, flags = stream.read(2)
+            game_key = chr(game_key)
+            if game_key not in RECORD_GAMES:
+                raise ValueError("unknown game {!r} in {}".format(game_key,
+                                                                  path))
+            start = stream.read_varint() if game_key == 's' else 0
+            count = stream.read_varint()
+            width = move_width(game_key, start)
+            packed = int.from_bytes(stream.read((count * width + 7) // 8),
+                                    'little')
+
+            mask = (1 << width) - 1
+            moves: List[Any] = []
+            for number in range(count):
+                code = (packed >> (number * width)) & mask
+                if game_key == 'c':
+                    moves.append(CS_MOVES[code])
+                else:
+                    moves.append((code + 1) * (code + 1))
+
+            yield GameRecord(game_key, start, bool(flags & 1), moves,
+                             _WINNERS[flags >> 1 & 3])
+
+
+def initial_state(record: GameRecord) -> GameCurrentState:
+    """
+    Return the position record's game started from.
+    >>> print(initial_state(GameRecord('s', 10, False, [])))
+    p2's turn to move; the current value is 10.
+    """
+
+    if record.game_key == 's':
+        return SSGameCurrentState(record.is_p1_turn, record.start)
+    return CSGameCurrentState(record.is_p1_turn)
+
+
+def replay(record: GameRecord) -> Iterator[GameCurrentState]:
+    """
+    Yield the positions of record's game, from the start to the end, by
+    replaying its moves through make_move. A move that is illegal in its
+    position raises a ValueError.
+    >>> record = GameRecord('s', 10, True, [9, 1], 'p2')
+    >>> [state.current_val for state in replay(record)]
+    [10, 1, 0]
+    """
+
+    state = initial_state(record)
+    yield state
+    for move in record.moves:
+        if not state.is_valid_move(move):
+            raise ValueError("{} is illegal in: {}".format(move, state))
+        state = state.make_move(move)
+        yield state
@@ -0,0 +1,129 @@
+"""
+Rendering of GameInterface.play, one buffered write per turn.
+
+A Renderer collects the text of a turn and writes it out in one call when
+flushed. Move lists longer than a few lines are summarized as their first
+and last moves and a count, and move_page lists any page of them on
+demand, so the cost of a turn does not grow with the number of moves.
+A quiet Renderer skips rendering altogether.
+"""
+from typing import Any, IO, List, Optional, Sequence
+import io
+import sys
+
+# The moves shown at each end of a summarized move list.
+SUMMARY_MOVES = 5
+
+# The moves listed on each page by move_page.
+PAGE_SIZE = 20
+
+
+def summarize_moves(moves: Sequence[Any], shown: int = SUMMARY_MOVES) \
+        -> List[str]:
+    """
+    Return lines listing moves, with only the first and last shown moves
+    when there are more than 2 * shown + 1.
+    >>> summarize_moves(['ll', 'rr'])
+    ['ll', 'rr']
+    >>> from games import SquareMoves
+    >>> summarize_moves(SquareMoves(10 ** 12), 2)
+    ['1', '4', '... 999996 more ...', '999998000001', '1000000000000', \
+'(1000000 moves; type ? and a page number to list them)']
+    """
+
+    count = len(moves)
+    if count <= 2 * shown + 1:
+        return [str(moves[index]) for index in range(count)]
+
+    return ([str(moves[index]) for index in range(shown)] +
+            ["... {} more ...".format(count - 2 * shown)] +
+            [str(moves[index]) for index in range(count - shown, count)] +
+            ["({} moves; type ? and a page number to list them)".format(
+                count)])
+
+
+def move_page(moves: Sequence[Any], page: int,
+              page_size: int = PAGE_SIZE) -> List[str]:
+    """
+    Return lines listing page number page (from 1) of moves.
+    >>> from games import SquareMoves
+    >>> move_page(SquareMoves(10 ** 12), 50000, 3)
+    ['Moves 149998 to 150000 of 1000000:', '22499400004', '22499700001', \
+'22500000000']
+    >>> move_page(['ll'], 2)
+    ['There are only 1 pages of moves.']
+    """
+
+    count = len(moves)
+    pages = max(-(-count // page_size), 1)
+    if not 1 <= page <= pages:
+        return ["There are only {} pages of moves.".format(pages)]
+
+    first = (page - 1) * page_size
+    last = min(first + page_size, count)
+    return (["Moves {} to {} of {}:".format(first + 1, last, count)] +
+            [str(moves[index]) for index in range(first, last)])
+
+
+class Renderer:
+    """
+    Writes what happens in a game, a turn at a time.
+    stream - where the text is written
+    quiet - whether to skip rendering altogether
+    shown - the moves shown at each end of a summarized move list
+    writes - the number of writes made to stream
+    """
+    stream: Optional[IO[str]]
+    quiet: bool
+    shown: int
+    writes: int
+    _buffer: io.StringIO
+
+    def __init__(self, stream: Optional[IO[str]] = None, quiet: bool = False,
+                 shown: int = SUMMARY_MOVES) -> None:
+        """
+        Initialize a Renderer writing to stream (standard output when
+        None).
+        >>> renderer = Renderer(io.StringIO())
+        >>> renderer.moves(range(1000))
+        >>> renderer.flush()
+        >>> renderer.writes, renderer.stream.getvalue().count('\\n')
+        (1, 13)
+        """
+
+        self.stream = stream
+        self.quiet = quiet
+        self.shown = shown
+        self.writes = 0
+        self._buffer = io.StringIO()
+
+    def line(self, text: Any = '') -> None:
+        """
+        Add text and a line break to the turn.
+        """
+
+        if not self.quiet:
+            self._buffer.write(str(text))
+            self._buffer.write('\n')
+
+    def moves(self, moves: Sequence[Any]) -> None:
+        """
+        Add the available moves, summarized if there are many, to the turn.
+        """
+
+        if not self.quiet:
+            self.line("The current available moves are:")
+            self.line('\n'.join(summarize_moves(moves, self.shown)))
+
+    def flush(self) -> None:
+        """
+        Write out the turn in one write.
+        """
+
+        text = self._buffer.getvalue()
+        if text:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write(text)
+            stream.flush()
+            self.writes += 1
+            self._buffer = io.StringIO()
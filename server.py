@@ -0,0 +1,490 @@
+"""
+Host many games at once over a local socket.
+
+GameServer keeps any number of sessions, each a game between a client and
+one of the computer strategies, and answers a line protocol over TCP or a
+Unix socket. Every request is one line of words and every reply is one
+JSON object on its own line:
+    NEW <game> <strategy> [start] [client|server]   start a session
+    MOVE <session> <move>                          play a move, get a reply
+    STATE <session>                                show a session
+    QUIT <session>                                 end a session
+    STATS [session]                                show the counters
+Strategies are plain functions, so they run in an executor and the event
+loop keeps serving other sessions while one is thinking. Run it with e.g.
+    python server.py --port 8765 --workers 4
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import time
+from games import Game
+from game_interface import playable_games, usable_strategies
+from simulate import DEFAULT_START, new_game
+
+# The host the server listens on when none is given.
+DEFAULT_HOST = '127.0.0.1'
+
+# Who moves first in a new session: the client is always p1.
+FIRST_MOVERS = ('client', 'server')
+
+# Connections waiting to be accepted, so thousands of clients can connect
+# at once.
+LISTEN_BACKLOG = 4096
+
+# The global counters of GameServer.stats.
+SERVER_COUNTERS = ('connections', 'requests', 'errors', 'sessions_opened',
+                   'sessions_finished', 'moves', 'strategy_calls')
+
+
+def _choose_move(strategy_key: str, game: Game) -> Any:
+    """
+    Return the move usable_strategies[strategy_key] picks in game.
+    Runs in an executor, which may be another process.
+    """
+
+    return usable_strategies[strategy_key](game)
+
+
+def make_async_strategy(strategy_key: str,
+                        executor: Optional[Executor] = None) \
+        -> Callable[[Game], Awaitable[Any]]:
+    """
+    Return an async callable that picks a move in a game with
+    usable_strategies[strategy_key], running it in executor (the event
+    loop's default executor if None).
+    >>> from games import ChopsticksGame
+    >>> strategy = make_async_strategy('m')
+    >>> asyncio.run(strategy(ChopsticksGame(True))) in ('ll', 'lr')
+    True
+    """
+
+    async def async_strategy(game: Game) -> Any:
+        """
+        Returns the move picked by the strategy without blocking the loop.
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, _choose_move,
+                                          strategy_key, game)
+
+    return async_strategy
+
+
+class Session:
+    """
+    A game between a client (p1) and a computer strategy (p2).
+    number - the number identifying the session
+    game - the game being played
+    strategy_key - the key of the server's strategy in usable_strategies
+    choose - the async callable picking the server's moves
+    lock - held while a move is being played, so moves never interleave
+    moves - the moves made so far by both players
+    strategy_time - seconds spent waiting for the server's moves
+    created - the time.monotonic() the session started at
+    """
+    number: int
+    game: Game
+    strategy_key: str
+    choose: Callable[[Game], Awaitable[Any]]
+    lock: asyncio.Lock
+    moves: int
+    strategy_time: float
+    created: float
+
+    def __init__(self, number: int, game: Game, strategy_key: str,
+                 choose: Callable[[Game], Awaitable[Any]]) -> None:
+        """
+        Initialize a session playing game, with no moves made yet.
+        """
+
+        self.number = number
+        self.game = game
+        self.strategy_key = strategy_key
+        self.choose = choose
+        self.lock = asyncio.Lock()
+        self.moves = 0
+        self.strategy_time = 0.0
+        self.created = time.monotonic()
+
+    def is_over(self) -> bool:
+        """
+        Return whether the game has ended.
+        """
+
+        return self.game.is_over(self.game.current_state)
+
+    def winner(self) -> Optional[str]:
+        """
+        Return 'client' or 'server' once one of them has won, else None.
+        """
+
+        if not self.is_over():
+            return None
+        if self.game.is_winner('p1'):
+            return 'client'
+        if self.game.is_winner('p2'):
+            return 'server'
+        return None
+
+    def play(self, move_to_make: Any) -> None:
+        """
+        Make move_to_make for the player to move.
+        """
+
+        self.game.current_state = \
+            self.game.current_state.make_move(move_to_make)
+        self.moves += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the position and counters of the session.
+        """
+
+        state = self.game.current_state
+        return {'session': self.number,
+                'state': str(state),
+                'to_move': ('client' if state.get_current_player_name() ==
+                            'p1' else 'server'),
+                'over': self.is_over(),
+                'winner': self.winner(),
+                'moves': self.moves,
+                'strategy_time': self.strategy_time,
+                'age': time.monotonic() - self.created}
+
+
+class GameServer:
+    """
+    A server hosting many sessions over one event loop.
+    sessions - the sessions still open, by number; a session is closed
+    when its game ends or the client quits it
+    executor - where strategies run
+    counters - the global counts, one for each of SERVER_COUNTERS
+    """
+    sessions: Dict[int, Session]
+    executor: Executor
+    counters: Dict[str, int]
+    _next_number: int
+
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        """
+        Initialize a server with no sessions, running strategies in
+        executor. Strategies share module-level caches, so by default
+        they run one at a time in a single thread.
+        >>> server = GameServer()
+        >>> reply = asyncio.run(server.handle_line('NEW s m 4'))
+        >>> reply['ok'], reply['state']
+        (True, "p1's turn to move; the current value is 4.")
+        >>> asyncio.run(server.handle_line('MOVE 1 4'))['winner']
+        'client'
+        """
+
+        self.sessions = {}
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1)
+        self.executor = executor
+        self.counters = {name: 0 for name in SERVER_COUNTERS}
+        self._next_number = 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the global counters and the number of open sessions.
+        """
+
+        stats: Dict[str, Any] = dict(self.counters)
+        stats['sessions_open'] = len(self.sessions)
+        return stats
+
+    async def handle_line(self, line: str) -> Dict[str, Any]:
+        """
+        Return the reply to one request line.
+        >>> asyncio.run(GameServer().handle_line('MOVE 7 1'))['error']
+        'no session 7'
+        """
+
+        self.counters['requests'] += 1
+        words = line.strip().split(None, 2)
+        try:
+            if not words:
+                raise ValueError("empty request")
+            command = words[0].upper()
+            if command == 'NEW':
+                reply = await self._new(line.split()[1:])
+            elif command == 'STATS':
+                reply = (self.stats() if len(words) == 1 else
+                         self._session(words).to_dict())
+            elif command == 'STATE':
+                reply = self._session(words).to_dict()
+            elif command == 'MOVE':
+                if len(words) < 3:
+                    raise ValueError("usage: MOVE <session> <move>")
+                reply = await self._move(self._session(words), words[2])
+            elif command == 'QUIT':
+                session = self._session(words)
+                del self.sessions[session.number]
+                reply = session.to_dict()
+            else:
+                raise ValueError("unknown command {}".format(words[0]))
+        except (ValueError, KeyError) as error:
+            self.counters['errors'] += 1
+            message = error.args[0] if error.args else str(error)
+            return {'ok': False, 'error': str(message)}
+        except Exception as error:
+            # a failing strategy answers this request, not the connection
+            self.counters['errors'] += 1
+            return {'ok': False, 'error': "internal error: {}: {}".format(
+                type(error).__name__, error)}
+
+        reply['ok'] = True
+        return reply
+
+    def _session(self, words: List[str]) -> Session:
+        """
+        Return the open session numbered by the second of words, raising a
+        ValueError if there is none.
+        """
+
+        if len(words) < 2:
+            raise ValueError("a session number is needed")
+        number = words[1]
+        if not number.isdigit() or int(number) not in self.sessions:
+            raise ValueError("no session {}".format(number))
+        return self.sessions[int(number)]
+
+    async def _new(self, words: List[str]) -> Dict[str, Any]:
+        """
+        Open a session from the words game, strategy, start and first mover.
+        The session is only opened once the server's opening move is made,
+        so a strategy that fails leaves no session behind.
+        >>> server = GameServer()
+        >>> def broken(game):
+        ...     raise RuntimeError("no move")
+        >>> usable_strategies['broken'] = broken
+        >>> asyncio.run(server.handle_line('NEW s broken 9 server'))['error']
+        'internal error: RuntimeError: no move'
+        >>> del usable_strategies['broken']
+        >>> server.sessions
+        {}
+        """
+
+        if len(words) < 2:
+            raise ValueError("usage: NEW <game> <strategy> [start] "
+                             "[client|server]")
+        game_key, strategy_key = words[0], words[1]
+        if game_key not in playable_games:
+            raise ValueError("unknown game {}".format(game_key))
+        if strategy_key == 'i' or not usable_strategies.get(strategy_key):
+            raise ValueError("unknown strategy {}".format(strategy_key))
+        start = DEFAULT_START
+        if len(words) > 2:
+            if not words[2].isdigit():
+                raise ValueError("the start must be a whole number")
+            start = int(words[2])
+        first = words[3] if len(words) > 3 else 'client'
+        if first not in FIRST_MOVERS:
+            raise ValueError("the first mover must be one of {}".format(
+                FIRST_MOVERS))
+
+        game = new_game(game_key, first == 'client', start)
+        session = Session(self._next_number, game, strategy_key,
+                          make_async_strategy(strategy_key, self.executor))
+        self._next_number += 1
+
+        # no other request can reach the session before it is registered
+        reply: Dict[str, Any] = {}
+        if first == 'server':
+            reply['reply'] = await self._server_move(session)
+        self.sessions[session.number] = session
+        self.counters['sessions_opened'] += 1
+        return self._finish(session, reply)
+
+    async def _move(self, session: Session, text: str) -> Dict[str, Any]:
+        """
+        Play the client's move text in session, then the server's answer.
+        """
+
+        async with session.lock:
+            state = session.game.current_state
+            if session.is_over():
+                raise ValueError("the game is over")
+            if state.get_current_player_name() != 'p1':
+                raise ValueError("it is not the client's turn")
+            move_to_make = session.game.str_to_move(text)
+            if not state.is_valid_move(move_to_make):
+                raise ValueError("illegal move {}".format(text))
+
+            session.play(move_to_make)
+            self.counters['moves'] += 1
+            reply: Dict[str, Any] = {'move': move_to_make}
+            if not session.is_over():
+                reply['reply'] = await self._server_move(session)
+            return self._finish(session, reply)
+
+    async def _server_move(self, session: Session) -> Any:
+        """
+        Pick and play the server's move in session, and return it.
+        """
+
+        began = time.perf_counter()
+        move_to_make = await session.choose(session.game)
+        session.strategy_time += time.perf_counter() - began
+        self.counters['strategy_calls'] += 1
+        if not session.game.current_state.is_valid_move(move_to_make):
+            raise ValueError("the strategy made the illegal move {}".format(
+                move_to_make))
+
+        session.play(move_to_make)
+        self.counters['moves'] += 1
+        return move_to_make
+
+    def _finish(self, session: Session,
+                reply: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return reply with the position of session added, closing the
+        session if its game has ended.
+        """
+
+        reply.update(session.to_dict())
+        if session.is_over():
+            self.sessions.pop(session.number, None)
+            self.counters['sessions_finished'] += 1
+        return reply
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """
+        Answer the requests of one connection until it closes.
+        """
+
+        self.counters['connections'] += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handle_line(
+                    line.decode('utf-8', 'replace'))
+                writer.write((json.dumps(reply, default=str) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: Optional[str] = DEFAULT_HOST, port: int = 0,
+                    path: Optional[str] = None) -> asyncio.AbstractServer:
+        """
+        Start listening on the Unix socket path if given, otherwise on host
+        and port (0 picks a free port), and return the asyncio server.
+        """
+
+        if path is not None:
+            return await asyncio.start_unix_server(
+                self.handle_connection, path, backlog=LISTEN_BACKLOG)
+        return await asyncio.start_server(self.handle_connection, host, port,
+                                          backlog=LISTEN_BACKLOG)
+
+
+class GameClient:
+    """
+    A client of a GameServer, sending one request line at a time.
+    reader - the stream replies are read from
+    writer - the stream requests are written to
+    """
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        """
+        Initialize a client talking over reader and writer.
+        """
+
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: Optional[str] = DEFAULT_HOST, port: int = 0,
+                      path: Optional[str] = None) -> 'GameClient':
+        """
+        Return a client connected to the Unix socket path if given,
+        otherwise to host and port.
+        """
+
+        if path is not None:
+            return cls(*await asyncio.open_unix_connection(path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, line: str) -> Dict[str, Any]:
+        """
+        Send the request line and return the server's reply.
+        >>> async def play():
+        ...     listener = await GameServer().start()
+        ...     client = await GameClient.connect(
+        ...         port=listener.sockets[0].getsockname()[1])
+        ...     opened = await client.request('NEW c m 0 server')
+        ...     stats = await client.request('STATS')
+        ...     await client.close()
+        ...     listener.close()
+        ...     return opened['reply'], stats['sessions_open']
+        >>> asyncio.run(play())
+        ('ll', 1)
+        """
+
+        self.writer.write((line.rstrip('\n') + '\n').encode())
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self) -> None:
+        """
+        Close the connection.
+        """
+
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(server: GameServer, host: Optional[str] = DEFAULT_HOST,
+                port: int = 0, path: Optional[str] = None) -> None:
+    """
+    Run server until the process is stopped.
+    """
+
+    listener = await server.start(host, port, path)
+    for sock in listener.sockets:
+        print("Listening on {}".format(sock.getsockname()), flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    """
+    Run a game server from the command line.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Host games over a line protocol.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=0,
+                        help="TCP port (0 picks a free one)")
+    parser.add_argument('--unix', metavar='PATH',
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="run strategies in this many processes "
+                             "(0 runs them in one thread)")
+    args = parser.parse_args()
+
+    server = GameServer(ProcessPoolExecutor(max_workers=args.workers)
+                        if args.workers > 0 else None)
+    with server.executor:
+        try:
+            asyncio.run(serve(server, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
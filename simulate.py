@@ -0,0 +1,345 @@
+"""
+Play many games between two strategies without any user interaction.
+
+Run from the command line, e.g. 1000 games of subtract square from 100
+between the random and minimax strategies:
+    python simulate.py s r m --games 1000 --start 100
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import random
+import time
+from games import Game, SubtractSquareGame
+from game_interface import playable_games, usable_strategies
+from records import RECORD_GAMES, GameRecord, RecordWriter, encode_record
+
+# Games still going after this many moves are stopped and counted as draws.
+MAX_MOVES = 1000
+
+# The starting value used for subtract square when none is given.
+DEFAULT_START = 100
+
+# Which player moves first in each game of a simulation.
+FIRST_MOVERS = ('p1', 'p2', 'alternate')
+
+
+class SimulationResult:
+    """
+    The aggregated outcome of a batch of simulated games.
+    p1_wins - games won by player 1
+    p2_wins - games won by player 2
+    draws - games that hit the move limit
+    lengths - how many games ended after each number of moves
+    elapsed - wall-clock seconds spent playing
+    records - the games encoded by encode_record, if they were recorded
+    """
+    p1_wins: int
+    p2_wins: int
+    draws: int
+    lengths: Counter
+    elapsed: float
+    records: bytearray
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty SimulationResult.
+        >>> SimulationResult().games
+        0
+        """
+
+        self.p1_wins = 0
+        self.p2_wins = 0
+        self.draws = 0
+        self.lengths = Counter()
+        self.elapsed = 0.0
+        self.records = bytearray()
+
+    @property
+    def games(self) -> int:
+        """
+        The number of games played.
+        """
+
+        return self.p1_wins + self.p2_wins + self.draws
+
+    @property
+    def games_per_second(self) -> float:
+        """
+        The number of games played per second of elapsed time.
+        """
+
+        if self.elapsed == 0:
+            return 0.0
+        return self.games / self.elapsed
+
+    def add_game(self, winner: Optional[str], moves: int) -> None:
+        """
+        Record one game that winner ('p1', 'p2' or None for a draw) won
+        after moves moves.
+        >>> result = SimulationResult()
+        >>> result.add_game('p1', 3)
+        >>> result.add_game(None, 1000)
+        >>> result.p1_wins, result.draws, result.lengths[3]
+        (1, 1, 1)
+        """
+
+        if winner == 'p1':
+            self.p1_wins += 1
+        elif winner == 'p2':
+            self.p2_wins += 1
+        else:
+            self.draws += 1
+        self.lengths[moves] += 1
+
+    def merge(self, other: 'SimulationResult') -> None:
+        """
+        Add the games of other to self. Elapsed times are not added, since
+        the batches may have been played at the same time.
+        """
+
+        self.p1_wins += other.p1_wins
+        self.p2_wins += other.p2_wins
+        self.draws += other.draws
+        self.lengths.update(other.lengths)
+        self.records += other.records
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return a summary of self that can be written out as JSON.
+        >>> result = SimulationResult()
+        >>> result.add_game('p2', 4)
+        >>> result.to_dict()['mean_length']
+        4.0
+        """
+
+        total_moves = sum(length * count
+                          for length, count in self.lengths.items())
+        return {'games': self.games,
+                'p1_wins': self.p1_wins,
+                'p2_wins': self.p2_wins,
+                'draws': self.draws,
+                'mean_length': total_moves / self.games if self.games else 0,
+                'shortest': min(self.lengths) if self.lengths else 0,
+                'longest': max(self.lengths) if self.lengths else 0,
+                'lengths': {str(length): self.lengths[length]
+                            for length in sorted(self.lengths)},
+                'elapsed': self.elapsed,
+                'games_per_second': self.games_per_second}
+
+    def __str__(self) -> str:
+        """
+        Return a user-friendly summary of SimulationResult.
+        """
+
+        summary = self.to_dict()
+        return ("{games} games: p1 won {p1_wins}, p2 won {p2_wins}, "
+                "{draws} draws; {mean_length:.1f} moves per game "
+                "({shortest} to {longest}); {games_per_second:.0f} games "
+                "per second.".format(**summary))
+
+
+def new_game(game_key: str, is_p1_turn: bool,
+             start: int = DEFAULT_START) -> Game:
+    """
+    Return a new game from playable_games, starting subtract square at
+    start instead of asking for a starting value.
+    >>> print(new_game('s', False, 12).current_state)
+    p2's turn to move; the current value is 12.
+    """
+
+    game_class = playable_games[game_key]
+    if issubclass(game_class, SubtractSquareGame):
+        return game_class(is_p1_turn, start)
+    return game_class(is_p1_turn)
+
+
+def play_game(game: Game, p1_strategy: Callable[[Any], Any],
+              p2_strategy: Callable[[Any], Any],
+              max_moves: int = MAX_MOVES,
+              moves_made: Optional[List[Any]] = None) \
+        -> Tuple[Optional[str], int]:
+    """
+    Play game to the end without printing anything, and return the winner
+    ('p1', 'p2', or None for a draw) and the number of moves made.
+    If moves_made is given, every move is appended to it.
+    A strategy that picks an illegal move raises a ValueError.
+    >>> from strategy import minimax_strategy
+    >>> play_game(new_game('s', True, 4), minimax_strategy, minimax_strategy)
+    ('p1', 1)
+    """
+
+    current_state = game.current_state
+    moves = 0
+
+    while not game.is_over(current_state):
+        if moves == max_moves:
+            return None, moves
+
+        if current_state.is_p1_turn:
+            move_to_make = p1_strategy(game)
+        else:
+            move_to_make = p2_strategy(game)
+        if not current_state.is_valid_move(move_to_make):
+            raise ValueError("{} made the illegal move {}.".format(
+                current_state.get_current_player_name(), move_to_make))
+
+        current_state = current_state.make_move(move_to_make)
+        game.current_state = current_state
+        moves += 1
+        if moves_made is not None:
+            moves_made.append(move_to_make)
+
+    if game.is_winner('p1'):
+        return 'p1', moves
+    if game.is_winner('p2'):
+        return 'p2', moves
+    return None, moves
+
+
+def _play_batch(game_key: str, p1_key: str, p2_key: str, first_game: int,
+                games: int, first: str, start: int, max_moves: int,
+                seed: Optional[int], record: bool = False) \
+        -> SimulationResult:
+    """
+    Play games first_game to first_game + games - 1 of a simulation and
+    return their results, with every game encoded in records if record is
+    set. Runs in a worker process.
+    """
+
+    if seed is not None:
+        random.seed(seed + first_game)
+
+    p1_strategy = usable_strategies[p1_key]
+    p2_strategy = usable_strategies[p2_key]
+    result = SimulationResult()
+    began = time.perf_counter()
+
+    for number in range(first_game, first_game + games):
+        is_p1_turn = first == 'p1' or (first == 'alternate'
+                                       and number % 2 == 0)
+        game = new_game(game_key, is_p1_turn, start)
+        moves_made: Optional[List[Any]] = [] if record else None
+        winner, moves = play_game(game, p1_strategy, p2_strategy, max_moves,
+                                  moves_made)
+        result.add_game(winner, moves)
+        if moves_made is not None:
+            result.records += encode_record(GameRecord(
+                game_key, start if game_key == 's' else 0, is_p1_turn,
+                moves_made, winner))
+
+    result.elapsed = time.perf_counter() - began
+    return result
+
+
+def _merge_batch(result: SimulationResult, batch: SimulationResult,
+                 records: Optional[RecordWriter]) -> None:
+    """
+    Add the games of batch to result, moving its encoded games to records
+    rather than keeping them in memory.
+    """
+
+    if records is not None:
+        records.append_encoded(batch.records)
+        records.games += batch.games
+        batch.records = bytearray()
+    result.merge(batch)
+
+
+def simulate(game_key: str, p1_key: str, p2_key: str, games: int,
+             start: int = DEFAULT_START, first: str = 'alternate',
+             workers: Optional[int] = None, batch_size: int = 1000,
+             max_moves: int = MAX_MOVES,
+             seed: Optional[int] = None,
+             records: Optional[RecordWriter] = None) -> SimulationResult:
+    """
+    Play games games of playable_games[game_key] between the strategies
+    usable_strategies[p1_key] and usable_strategies[p2_key], and return the
+    aggregated results.
+
+    first is 'p1', 'p2' or 'alternate' (p1 moves first in even games).
+    Games are split into batches of batch_size and spread over workers
+    processes (all cores by default); workers=1 plays them in this process.
+    If records is given, every game is appended to it, in order.
+    >>> simulate('c', 'm', 'm', 4, workers=1).draws
+    4
+    """
+
+    if first not in FIRST_MOVERS:
+        raise ValueError("first must be one of {}".format(FIRST_MOVERS))
+    if usable_strategies[p1_key] is None or usable_strategies[p2_key] is None:
+        raise ValueError("both strategies must be implemented")
+    if records is not None and game_key not in RECORD_GAMES:
+        raise ValueError("games of {} cannot be recorded".format(game_key))
+
+    batches = [(game_key, p1_key, p2_key, number,
+                min(batch_size, games - number), first, start, max_moves,
+                seed, records is not None)
+               for number in range(0, games, batch_size)]
+    result = SimulationResult()
+    began = time.perf_counter()
+
+    if workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            _merge_batch(result, _play_batch(*batch), records)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_play_batch, *batch)
+                       for batch in batches]
+            for future in futures:
+                _merge_batch(result, future.result(), records)
+
+    result.elapsed = time.perf_counter() - began
+    return result
+
+
+def main() -> None:
+    """
+    Run a simulation from the command line and print its results.
+    """
+
+    computer_strategies = [key for key in usable_strategies
+                           if key != 'i' and usable_strategies[key]]
+    parser = argparse.ArgumentParser(
+        description="Play many games between two strategies.")
+    parser.add_argument('game', choices=sorted(playable_games))
+    parser.add_argument('p1', choices=computer_strategies,
+                        help="strategy for player 1")
+    parser.add_argument('p2', choices=computer_strategies,
+                        help="strategy for player 2")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--start', type=int, default=DEFAULT_START,
+                        help="starting value for subtract square")
+    parser.add_argument('--first', choices=FIRST_MOVERS,
+                        default='alternate')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--max-moves', type=int, default=MAX_MOVES)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--json', action='store_true',
+                        help="print the results as JSON")
+    parser.add_argument('--record', metavar='FILE',
+                        help="append every game to FILE (see records.py)")
+    args = parser.parse_args()
+
+    records = RecordWriter(args.record) if args.record else None
+    try:
+        result = simulate(args.game, args.p1, args.p2, args.games,
+                          start=args.start, first=args.first,
+                          workers=args.workers, batch_size=args.batch_size,
+                          max_moves=args.max_moves, seed=args.seed,
+                          records=records)
+    finally:
+        if records is not None:
+            records.close()
+    if args.json:
+        print(json.dumps(result.to_dict()))
+    else:
+        print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+"""This is the file containing the bulk solvers for our games."""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from math import isqrt
+import os
+from games import CSGameCurrentState, CS_CANONICAL
+from games import cs_possible_moves, cs_make_move, cs_orient_move
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# Outcomes of a position, from the point of view of the player to move.
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# The largest subtract square value the strategies will tabulate.
+SS_TABLE_LIMIT = 10 ** 8
+
+# The largest value the table grows to on its own when a strategy asks for
+# a value: solving that far takes a second or two, where SS_TABLE_LIMIT
+# takes most of a minute and 100 MB. Larger values are searched instead.
+SS_ON_DEMAND_LIMIT = 10 ** 7
+
+# _sieve_losses starts with windows of this many values.
+_SIEVE_WINDOW = 1024
+
+# The table of subtract square outcomes solved so far (see ss_table).
+_ss_table: Any = None
+
+# The subtract square tablebase consulted before any table is built: the
+# file named by the SS_TABLEBASE environment variable, unless use_tablebase
+# chooses another.
+_tablebase: Any = None
+_tablebase_path: Optional[str] = os.environ.get('SS_TABLEBASE')
+
+# The solved chopsticks game, once solve_chopsticks has run.
+_cs_solution: Any = None
+
+
+def _new_ss_table(size: int) -> Any:
+    """
+    Return an all-False boolean table with size entries.
+    """
+
+    if np is not None:
+        return np.zeros(size, dtype=bool)
+    return bytearray(size)
+
+
+def _sieve_losses(win: Any, old_n: int) -> None:
+    """
+    Fill in the NumPy table win beyond old_n, every value up to old_n
+    being solved already.
+
+    Losses already known first mark the values a square above them past
+    old_n: for each square, the losses it carries past old_n are a run of
+    the sorted losses, marked in one step. The rest of the table is then
+    sieved a window at a time. The values a window leaves unmarked are
+    settled against each other (one of them is a loss unless a square
+    separates it from a smaller loss of the window), and every value a
+    square above the losses found is marked in one scatter. Windows adapt
+    to the density of losses, which thins out as values grow.
+    """
+
+    n = len(win) - 1
+    roots = np.arange(1, isqrt(n) + 1, dtype=np.int64)
+    squares = roots * roots
+
+    old_losses = np.flatnonzero(~win[:old_n + 1])
+    for square in squares.tolist():
+        first = int(np.searchsorted(old_losses, old_n - square + 1))
+        last = int(np.searchsorted(old_losses, n - square + 1))
+        if first < last:
+            win[old_losses[first:last] + square] = True
+
+    size = _SIEVE_WINDOW
+    is_square = np.zeros(size, dtype=bool)
+    is_square[squares[squares < size]] = True
+    pos = old_n + 1
+
+    while pos <= n:
+        end = min(n + 1, pos + size)
+        left = np.flatnonzero(~win[pos:end])
+        losses = []
+        while len(left):
+            losses.append(int(left[0]))
+            left = left[1:][~is_square[left[1:] - left[0]]]
+
+        if losses:
+            found = np.array(losses, dtype=np.int64) + pos
+            # square by square, so each step writes near the last; only
+            # the largest squares can pass n, so only they are checked
+            full = isqrt(n - int(found[-1]))
+            win[(squares[:full, None] + found[None, :]).ravel()] = True
+            marks = (squares[full:isqrt(n - pos), None] +
+                     found[None, :]).ravel()
+            win[marks[marks <= n]] = True
+
+        pos = end
+        # aim for a few dozen losses a window
+        if len(losses) < 32:
+            size *= 2
+            is_square = np.zeros(size, dtype=bool)
+            is_square[squares[squares < size]] = True
+
+
+def _next_loss(win: Any, pos: int) -> int:
+    """
+    Return the first index at or after pos whose entry in the bytearray
+    win is 0, or len(win) if there is none.
+    """
+
+    found = win.find(0, pos)
+    return len(win) if found == -1 else found
+
+
+def _mark_wins(win: Any, loss: int, low: int, high: int) -> None:
+    """
+    Mark loss + k * k as winning in the bytearray win for every k with
+    low <= k <= high.
+    """
+
+    for k in range(low, high + 1):
+        win[loss + k * k] = 1
+
+
+def extend_subtract_square(table: Any, n: int) -> Any:
+    """
+    Return the win/loss table for subtract square values 0 to n, reusing
+    every value already solved in table.
+
+    Entry v is True if the player to move at v wins. A value is a loss
+    exactly when no square leads to another loss, so the table is a sieve:
+    each loss found marks every value a square above it as a win. With
+    NumPy the sieve runs in batched steps (see _sieve_losses); solving to
+    SS_ON_DEMAND_LIMIT takes a second or two, and to SS_TABLE_LIMIT most of
+    a minute and a 100 MB table.
+    >>> list(map(bool, extend_subtract_square(solve_subtract_square(4), 7)))
+    [False, True, False, True, True, False, True, False]
+    """
+
+    old_n = len(table) - 1
+    if n <= old_n:
+        return table[:n + 1]
+
+    win = _new_ss_table(n + 1)
+    win[:old_n + 1] = table
+
+    if np is not None:
+        _sieve_losses(win, old_n)
+        return win
+
+    # losses already known can still reach values beyond the old table
+    for loss in [v for v in range(old_n + 1) if not win[v]]:
+        _mark_wins(win, loss, isqrt(old_n - loss) + 1, isqrt(n - loss))
+
+    pos = old_n + 1
+    while pos <= n:
+        loss = _next_loss(win, pos)
+        if loss > n:
+            break
+        _mark_wins(win, loss, 1, isqrt(n - loss))
+        pos = loss + 1
+
+    return win
+
+
+def solve_subtract_square(n: int) -> Any:
+    """
+    Return a boolean table whose entry v (0 <= v <= n) is True if the player
+    to move wins subtract square from the value v.
+
+    The table is a NumPy bool array, or a bytearray when NumPy is missing.
+    >>> [v for v, w in enumerate(solve_subtract_square(20)) if not w]
+    [0, 2, 5, 7, 10, 12, 15, 17, 20]
+    """
+
+    return extend_subtract_square(_new_ss_table(0), n)
+
+
+def ss_table(n: int) -> Any:
+    """
+    Return the shared subtract square table, grown to cover at least n.
+    The table at least doubles on each growth to keep re-solving rare, but
+    does not double past SS_ON_DEMAND_LIMIT unless n itself is larger.
+    >>> len(ss_table(10)) > 10
+    True
+    """
+
+    global _ss_table
+
+    if _ss_table is None or len(_ss_table) <= n:
+        current = 0 if _ss_table is None else len(_ss_table)
+        size = min(max(n, 2 * current, 1024), max(n, SS_ON_DEMAND_LIMIT))
+        if _ss_table is None:
+            _ss_table = solve_subtract_square(size)
+        else:
+            _ss_table = extend_subtract_square(_ss_table, size)
+
+    return _ss_table
+
+
+def use_tablebase(path: Optional[str]) -> None:
+    """
+    Make ss_is_winning and ss_best_move look values up in the tablebase
+    file at path (see tablebase.py), or stop using a tablebase if path is
+    None. The file is opened on first use.
+    """
+
+    global _tablebase, _tablebase_path
+
+    if _tablebase is not None:
+        _tablebase.close()
+    _tablebase = None
+    _tablebase_path = path
+
+
+def _get_tablebase() -> Any:
+    """
+    Return the open tablebase, or None if there is none to use.
+    """
+
+    global _tablebase
+
+    if _tablebase is None and _tablebase_path:
+        from tablebase import SSTablebase
+        _tablebase = SSTablebase(_tablebase_path)
+
+    return _tablebase
+
+
+def ss_quick_limit() -> int:
+    """
+    Return the largest subtract square value ss_is_winning answers without
+    solving past SS_ON_DEMAND_LIMIT: the last value of the tablebase if
+    there is one, or else of the table solved so far, if larger.
+    >>> ss_quick_limit() >= SS_ON_DEMAND_LIMIT
+    True
+    """
+
+    tablebase = _get_tablebase()
+    if tablebase is not None:
+        return max(SS_ON_DEMAND_LIMIT, tablebase.count - 1)
+
+    solved = 0 if _ss_table is None else len(_ss_table) - 1
+    return max(SS_ON_DEMAND_LIMIT, solved)
+
+
+def ss_is_winning(value: int) -> bool:
+    """
+    Return whether the player to move wins subtract square from value.
+    >>> ss_is_winning(0)
+    False
+    >>> ss_is_winning(4)
+    True
+    """
+
+    tablebase = _get_tablebase()
+    if tablebase is not None:
+        return tablebase.is_winning(value)
+
+    return bool(ss_table(value)[value])
+
+
+def ss_best_move(value: int) -> Optional[int]:
+    """
+    Return the smallest square that leaves the opponent at a losing value,
+    or None if value is itself a loss.
+    >>> ss_best_move(11)
+    1
+    >>> ss_best_move(9)
+    4
+    >>> ss_best_move(7) is None
+    True
+    """
+
+    tablebase = _get_tablebase()
+    if tablebase is not None:
+        return tablebase.best_move(value)
+
+    table = ss_table(value)
+    if not table[value]:
+        return None
+
+    for k in range(1, isqrt(value) + 1):
+        if not table[value - k * k]:
+            return k * k
+
+    return None
+
+
+class ChopsticksSolution:
+    """
+    The outcome of every chopsticks position under perfect play. Positions
+    that differ only by swapping a player's hands have the same outcome, so
+    only canonical positions (see cs_canonical) are stored, and moves are
+    turned back to the orientation of the position asked about.
+    index - the row of each canonical packed position in the tables below
+    outcome - WIN, LOSS or DRAW for the player to move, by row
+    distance - plies until the game ends under perfect play
+               (-1 for draws), by row
+    moves - the legal moves and the canonical position each leads to, by row
+    """
+    index: Dict[int, int]
+    outcome: List[int]
+    distance: List[int]
+    moves: List[List[Tuple[str, int]]]
+
+    def __init__(self, index: Dict[int, int], outcome: List[int],
+                 distance: List[int],
+                 moves: List[List[Tuple[str, int]]]) -> None:
+        """
+        Initialize this ChopsticksSolution with the solved tables.
+        """
+
+        self.index = index
+        self.outcome = outcome
+        self.distance = distance
+        self.moves = moves
+
+    def __len__(self) -> int:
+        """
+        Return the number of positions stored.
+        >>> len(solve_chopsticks())
+        450
+        """
+
+        return len(self.outcome)
+
+    def lookup(self, state: CSGameCurrentState) -> Tuple[int, int]:
+        """
+        Return the outcome and distance to the end of state.
+        >>> solve_chopsticks().lookup(CSGameCurrentState(True))
+        (0, -1)
+        """
+
+        return self.lookup_code(state.code)
+
+    def lookup_code(self, code: int) -> Tuple[int, int]:
+        """
+        Return the outcome and distance to the end of the packed position
+        code, without a state object.
+        >>> solve_chopsticks().lookup_code(312)
+        (0, -1)
+        """
+
+        row = self.index[CS_CANONICAL[code]]
+        return self.outcome[row], self.distance[row]
+
+    def best_move(self, state: CSGameCurrentState) -> Optional[str]:
+        """
+        Return the move that keeps the best outcome for the player to move
+        in state: the fastest win, the slowest loss, or a move that keeps
+        the draw. Return None if there are no moves.
+        >>> state = CSGameCurrentState(True)
+        >>> solve_chopsticks().best_move(state) in state.get_possible_moves()
+        True
+        """
+
+        return self.best_move_code(state.code)
+
+    def best_move_code(self, code: int) -> Optional[str]:
+        """
+        Return the best move in the packed position code, as best_move
+        does, without a state object.
+        """
+
+        best_move = None
+        best_rank = None
+
+        for move, child in self.moves[self.index[CS_CANONICAL[code]]]:
+            # rank each reply from the mover's point of view: a reply that
+            # leaves the opponent lost is best, then the quickest such loss
+            row = self.index[child]
+            outcome = -self.outcome[row]
+            if outcome == WIN:
+                rank = (WIN, -self.distance[row])
+            else:
+                rank = (outcome, self.distance[row])
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = move, rank
+
+        if best_move is None:
+            return None
+        return cs_orient_move(code, best_move)
+
+
+def solve_chopsticks() -> ChopsticksSolution:
+    """
+    Return the solved chopsticks game, solving it on the first call.
+    >>> solution = solve_chopsticks()
+    >>> solution.lookup(CSGameCurrentState(False))[0] == DRAW
+    True
+    """
+
+    global _cs_solution
+
+    if _cs_solution is None:
+        _cs_solution = build_chopsticks_solution()
+
+    return _cs_solution
+
+
+def build_chopsticks_solution() -> ChopsticksSolution:
+    """
+    Solve chopsticks from scratch by retrograde analysis.
+
+    Every canonical position is enumerated and linked to the canonical
+    positions it can be reached from, using the rules of
+    CSGameCurrentState.make_move. Labels then spread backwards from the
+    positions with no moves (losses for the player to move): a predecessor
+    of a loss is a win, and a position whose moves all lead to wins is a
+    loss. Whatever is never labelled can cycle forever: a draw.
+    """
+
+    positions = sorted(set(CS_CANONICAL))
+    index = {code: row for row, code in enumerate(positions)}
+    size = len(positions)
+    moves: List[List[Tuple[str, int]]] = []
+    predecessors: List[List[int]] = [[] for _ in range(size)]
+    unresolved = []
+
+    for row, code in enumerate(positions):
+        children = []
+        child_rows = set()
+        for move in cs_possible_moves(code):
+            child = CS_CANONICAL[cs_make_move(code, move)]
+            children.append((move, child))
+            child_rows.add(index[child])
+        # moves to equivalent positions count once
+        for child_row in child_rows:
+            predecessors[child_row].append(row)
+        moves.append(children)
+        unresolved.append(len(child_rows))
+
+    outcome = [DRAW] * size
+    distance = [-1] * size
+    queue = deque()
+    for row in range(size):
+        if unresolved[row] == 0:
+            outcome[row] = LOSS
+            distance[row] = 0
+            queue.append(row)
+
+    # positions leave the queue in order of distance, so the last child
+    # to resolve a loss is also its furthest one
+    while queue:
+        row = queue.popleft()
+        for parent in predecessors[row]:
+            if distance[parent] != -1:
+                continue
+            if outcome[row] == LOSS:
+                outcome[parent] = WIN
+                distance[parent] = distance[row] + 1
+                queue.append(parent)
+            else:
+                unresolved[parent] -= 1
+                if unresolved[parent] == 0:
+                    outcome[parent] = LOSS
+                    distance[parent] = distance[row] + 1
+                    queue.append(parent)
+
+    return ChopsticksSolution(index, outcome, distance, moves)
@@ -1,13 +1,54 @@
 """ This is the strategy file."""
-from typing import Any, Union
+from typing import Any, Callable, Dict, List, Optional, Union
+import math
 import random
+import time
 from games import SubtractSquareGame, ChopsticksGame
+from games import GameCurrentState
+from solvers import WIN, DRAW, LOSS
+from solvers import ss_best_move, ss_quick_limit, solve_chopsticks
+from subtraction import SubtractionGame, MultiHeapSubtractSquareGame
+from subtraction import heaps_best_move
+from chopsticks import ChopsticksVariantGame, solve_variant
+from render import move_page
+from negamax import SSNegamax, MEMO_ENTRIES, MAX_DEPTH, NODE_BUDGET
+from cancel import SearchCancelled, check_cancelled, CHECK_INTERVAL
+
+# Every position solved so far, by canonical_state_key, so repeated and
+# symmetric positions are never re-searched.
+transposition_table: Dict[Any, int] = {}
+
+# The search minimax_strategy plays subtract square with above the table.
+ss_negamax = SSNegamax()
+
+# Marks an exhausted move iterator in solve_state.
+_NO_MORE_MOVES = object()
+
+# Default per-move budget of mcts_strategy, in seconds.
+MCTS_TIME_BUDGET = 0.1
+
+# The exploration constant of the UCT formula.
+MCTS_EXPLORATION = 1.4
+
+# Random playouts still going after this many moves are scored as draws.
+PLAYOUT_MAX_MOVES = 200
+
+# Nodes with at most this many moves pick untried moves from a list;
+# larger nodes sample them at random instead of listing every move.
+_SMALL_BRANCHING = 64
+
 
 def interactive_strategy(game: Any) -> Any:
     """
     Return a move for game through interactively asking the user for input.
+    Typing ? and a page number lists that page of the available moves.
     """
     move = input("Enter a move: ")
+    while move.startswith('?'):
+        page = move[1:].strip()
+        print('\n'.join(move_page(game.current_state.get_possible_moves(),
+                                   int(page) if page.isdigit() else 1)))
+        move = input("Enter a move: ")
     return game.str_to_move(move)
 
 
@@ -22,3 +63,430 @@ def current_strategy(game: Union[ChopsticksGame, SubtractSquareGame]) \
     total_moves = len(legal_moves)
 
     return legal_moves[random.randint(0, total_moves - 1)]
+
+
+def state_key(state: GameCurrentState) -> Any:
+    """
+    Return a hashable key identifying the position of state, which is
+    distinct across games.
+    >>> from games import SSGameCurrentState, CSGameCurrentState
+    >>> state_key(SSGameCurrentState(True, 5))
+    ('SSGameCurrentState', 11)
+    >>> state_key(CSGameCurrentState(False))
+    ('CSGameCurrentState', 312)
+    """
+
+    return type(state).__name__, state.key
+
+
+def canonical_state_key(state: GameCurrentState) -> Any:
+    """
+    Return the key state is stored under in transposition_table: the same
+    for positions that only differ by a symmetry of the game, so each is
+    solved once.
+    >>> from games import CSGameCurrentState
+    >>> left = CSGameCurrentState(True).make_move("ll")
+    >>> right = CSGameCurrentState(True).make_move("lr")
+    >>> canonical_state_key(left) == canonical_state_key(right)
+    True
+    """
+
+    return type(state).__name__, state.canonical_key
+
+
+def solve_state(state: GameCurrentState) -> int:
+    """
+    Return WIN, LOSS or DRAW for the player to move in state under
+    perfect play, storing every position searched in transposition_table.
+
+    The search keeps its own stack, so long games (e.g. subtract square
+    from a large value) do not hit the recursion limit, and walks the tree
+    on state itself with push and pop, leaving it as it was. A position
+    that repeats along the line being searched is scored as a draw. That
+    score depends on the line that reached it, so positions whose value
+    rests on a repetition are never stored in transposition_table: only
+    the value returned for state itself is known to be right. A search
+    cancelled from another thread (see cancel.py) leaves state as it was
+    too.
+    >>> from games import SSGameCurrentState
+    >>> solve_state(SSGameCurrentState(True, 0)) == LOSS
+    True
+    >>> solve_state(SSGameCurrentState(True, 4)) == WIN
+    True
+    >>> solve_state(SSGameCurrentState(False, 5)) == LOSS
+    True
+    >>> from games import CSGameCurrentState
+    >>> state = CSGameCurrentState(False)
+    >>> state.current_value = [1, 3, 1, 4]
+    >>> solve_state(state) == WIN
+    True
+    """
+
+    key = canonical_state_key(state)
+    if key in transposition_table:
+        return transposition_table[key]
+
+    # each frame is [key, remaining moves, best outcome so far, whether
+    # that outcome rests on a repetition]; the frame on top is the
+    # position state is at
+    stack = [[key, iter(state.get_possible_moves()), LOSS, False]]
+    on_path = {key}
+    result = LOSS
+    steps = 0
+
+    while stack:
+        steps += 1
+        if steps % CHECK_INTERVAL == 0:
+            try:
+                check_cancelled()
+            except SearchCancelled:
+                # leave state as it was: every frame above the root
+                # is one move pushed on it
+                for _ in range(len(stack) - 1):
+                    state.pop()
+                raise
+        frame = stack[-1]
+        move = _NO_MORE_MOVES
+        if frame[2] != WIN:
+            move = next(frame[1], _NO_MORE_MOVES)
+
+        if move is not _NO_MORE_MOVES:
+            state.push(move)
+            child_key = canonical_state_key(state)
+            if child_key in transposition_table:
+                _update_frame(frame, -transposition_table[child_key], False)
+            elif child_key in on_path:
+                _update_frame(frame, DRAW, True)
+            else:
+                on_path.add(child_key)
+                stack.append([child_key, iter(state.get_possible_moves()),
+                              LOSS, False])
+                continue
+            state.pop()
+            continue
+
+        # every move has been tried (or a win was found), so frame is solved
+        stack.pop()
+        on_path.discard(frame[0])
+        if not frame[3]:
+            transposition_table[frame[0]] = frame[2]
+        if stack:
+            state.pop()
+            _update_frame(stack[-1], -frame[2], frame[3])
+        else:
+            result = frame[2]
+
+    return result
+
+
+def _update_frame(frame: List[Any], outcome: int, repeated: bool) -> None:
+    """
+    Fold the outcome of one move into a frame of solve_state. repeated
+    is whether that outcome rests on a repetition. A win through a move
+    that does not is proven whatever else was seen.
+    """
+
+    if outcome == WIN and not repeated:
+        frame[2], frame[3] = WIN, False
+    elif outcome > frame[2]:
+        frame[2], frame[3] = outcome, frame[3] or repeated
+    else:
+        frame[3] = frame[3] or repeated
+
+
+def minimax_strategy(game: Union[ChopsticksGame, SubtractSquareGame]) \
+        -> Union[str, int]:
+    """
+    Returns the move with the best outcome under perfect play.
+    >>> game = ChopsticksGame(True)
+    >>> game.current_state.is_valid_move(minimax_strategy(game))
+    True
+    """
+
+    state = game.current_state
+
+    # other subtraction games are answered from their Grundy values
+    if isinstance(game, SubtractionGame):
+        move = game.engine.best_move(state.current_val)
+        moves = state.get_possible_moves()
+        if move is not None or not moves:
+            return move
+        return moves[0]
+
+    # a sum of subtract square heaps is answered from the nim-sum
+    if isinstance(game, MultiHeapSubtractSquareGame):
+        move = heaps_best_move(state.heaps)
+        moves = state.get_possible_moves()
+        if move is not None or not moves:
+            return move
+        return moves[0]
+
+    # subtract square is answered by the tablebase or the bulk win/loss
+    # table when either covers the value or is quick to solve that far
+    if (isinstance(game, SubtractSquareGame)
+            and state.current_val <= ss_quick_limit()):
+        move = ss_best_move(state.current_val)
+        if move is not None or state.current_val == 0:
+            return move
+        return 1
+
+    # larger subtract square values are searched back down to the table
+    if isinstance(game, SubtractSquareGame):
+        return ss_negamax.best_move(state.current_val)
+
+    # chopsticks variants are each solved once into flat arrays
+    if isinstance(game, ChopsticksVariantGame):
+        return solve_variant(game.rules).best_move(state)
+
+    # chopsticks is solved once by retrograde analysis, cycles included
+    if isinstance(game, ChopsticksGame):
+        return solve_chopsticks().best_move(state)
+
+    best_move = None
+    best_outcome = LOSS - 1
+
+    for move in state.get_possible_moves():
+        outcome = -solve_state(state.make_move(move))
+        if outcome > best_outcome:
+            best_move, best_outcome = move, outcome
+        if best_outcome == WIN:
+            break
+
+    return best_move
+
+
+def make_negamax_strategy(max_entries: Optional[int] = MEMO_ENTRIES,
+                          max_bytes: Optional[int] = None,
+                          max_depth: int = MAX_DEPTH,
+                          node_budget: int = NODE_BUDGET) \
+        -> Callable[[Any], Any]:
+    """
+    Return a strategy that plays subtract square by an SSNegamax search
+    whose memo keeps at most max_entries values and max_bytes bytes, so its
+    memory stays flat however long it plays. Other games are played by
+    minimax_strategy. The search is kept as the search attribute of the
+    strategy, e.g. to read its memo statistics.
+    >>> strategy = make_negamax_strategy(max_entries=1000)
+    >>> game = SubtractSquareGame(True, 10 ** 14)
+    >>> strategy(game)
+    100000000000000
+    >>> strategy.search.memo.stats()['entries'] <= 1000
+    True
+    """
+
+    search = SSNegamax(max_entries, max_bytes, max_depth=max_depth,
+                       node_budget=node_budget)
+
+    def negamax_strategy(game: Union[ChopsticksGame, SubtractSquareGame]) \
+            -> Union[str, int]:
+        """
+        Returns the move proven best by a bounded negamax search.
+        """
+
+        if (isinstance(game, SubtractSquareGame) and
+                not isinstance(game, (SubtractionGame,
+                                      MultiHeapSubtractSquareGame))):
+            return search.best_move(game.current_state.current_val)
+        return minimax_strategy(game)
+
+    negamax_strategy.search = search  # type: ignore
+    return negamax_strategy
+
+
+# The negamax strategy with the default memo budget.
+negamax_strategy = make_negamax_strategy()
+
+
+class MCTSNode:
+    """
+    A node of the tree searched by the strategies of make_mcts_strategy.
+    state - the position at this node
+    player - the player who moved into state ('p1' or 'p2')
+    parent - the node above this one, or None for the root
+    children - the nodes expanded so far, by the move leading to them
+    moves - the possible moves of state
+    visits - the number of playouts through this node
+    reward - the total reward of those playouts for player
+    """
+    __slots__ = ('state', 'player', 'parent', 'children', 'moves',
+                 'visits', 'reward')
+    state: GameCurrentState
+    player: str
+    parent: Optional['MCTSNode']
+    children: Dict[Any, 'MCTSNode']
+    moves: Any
+    visits: int
+    reward: float
+
+    def __init__(self, state: GameCurrentState, player: str,
+                 parent: Optional['MCTSNode'] = None) -> None:
+        """
+        Initialize an unvisited node for state.
+        """
+
+        self.state = state
+        self.player = player
+        self.parent = parent
+        self.children = {}
+        self.moves = state.get_possible_moves()
+        self.visits = 0
+        self.reward = 0.0
+
+    def can_expand(self) -> bool:
+        """
+        Return whether another child should be expanded. The number of
+        children grows with the square root of the visits (progressive
+        widening), so nodes with a million moves still get revisited.
+        """
+
+        return (len(self.children) < len(self.moves) and
+                len(self.children) <= math.sqrt(self.visits))
+
+    def untried_move(self) -> Any:
+        """
+        Return a random move that has no child yet.
+        """
+
+        if len(self.moves) <= _SMALL_BRANCHING:
+            return random.choice([move for move in self.moves
+                                  if move not in self.children])
+
+        # children are a tiny fraction of the moves, so sampling is O(1)
+        while True:
+            move = self.moves[random.randrange(len(self.moves))]
+            if move not in self.children:
+                return move
+
+    def best_child(self, exploration: float) -> 'MCTSNode':
+        """
+        Return the child with the highest UCT score.
+        """
+
+        log_visits = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda child: child.reward / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+
+def _random_playout(state: GameCurrentState) -> Optional[str]:
+    """
+    Play random moves from state and return the winner, or None if the
+    game is still going after PLAYOUT_MAX_MOVES moves.
+    """
+
+    # the first move copies state, and the rest are played on the copy
+    played = state
+    for _ in range(PLAYOUT_MAX_MOVES):
+        moves = played.get_possible_moves()
+        if len(moves) == 0:
+            # the player to move has no moves, so the other player won
+            return 'p2' if played.is_p1_turn else 'p1'
+        move = moves[random.randrange(len(moves))]
+        if played is state:
+            played = state.make_move(move)
+        else:
+            played.push(move)
+
+    return None
+
+
+def _find_subtree(root: Optional[MCTSNode],
+                  state: GameCurrentState) -> Optional[MCTSNode]:
+    """
+    Return the node for state among root and the two levels below it
+    (one move by each player), or None if it is not there.
+    """
+
+    if root is None:
+        return None
+
+    key = state_key(state)
+    level = [root]
+    for _ in range(3):
+        for node in level:
+            if state_key(node.state) == key:
+                return node
+        level = [child for node in level
+                 for child in node.children.values()]
+
+    return None
+
+
+def make_mcts_strategy(time_budget: Optional[float] = MCTS_TIME_BUDGET,
+                       playouts: Optional[int] = None,
+                       exploration: float = MCTS_EXPLORATION) \
+        -> Callable[[Any], Any]:
+    """
+    Return a Monte Carlo tree search strategy that spends at most
+    time_budget seconds and at most playouts random playouts on each move.
+    At least one of the two budgets must be given.
+
+    The strategy keeps its tree between moves and continues from the
+    subtree of the position it is asked about.
+    >>> strategy = make_mcts_strategy(None, playouts=200)
+    >>> game = SubtractSquareGame(True, 10 ** 12)
+    >>> game.current_state.is_valid_move(strategy(game))
+    True
+    """
+
+    if time_budget is None and playouts is None:
+        raise ValueError("mcts needs a time budget or a playout budget")
+
+    tree: List[Optional[MCTSNode]] = [None]
+
+    def mcts_strategy(game: Union[ChopsticksGame, SubtractSquareGame]) \
+            -> Union[str, int]:
+        """
+        Returns the move visited most by a Monte Carlo tree search.
+        """
+
+        state = game.current_state
+        root = _find_subtree(tree[0], state)
+        if root is None:
+            opponent = 'p2' if state.is_p1_turn else 'p1'
+            root = MCTSNode(state, opponent)
+        root.parent = None
+        tree[0] = root
+
+        deadline = None
+        if time_budget is not None:
+            deadline = time.perf_counter() + time_budget
+        done = 0
+
+        while ((playouts is None or done < playouts) and
+               (deadline is None or time.perf_counter() < deadline)):
+            check_cancelled()
+            # selection: follow UCT while the nodes are fully widened
+            node = root
+            while len(node.moves) > 0 and not node.can_expand():
+                node = node.best_child(exploration)
+
+            # expansion: add one new child below the selected node
+            if len(node.moves) > 0:
+                move = node.untried_move()
+                child = MCTSNode(node.state.make_move(move),
+                                 node.state.get_current_player_name(), node)
+                node.children[move] = child
+                node = child
+
+            # simulation, then backpropagation of the winner
+            winner = _random_playout(node.state)
+            while node is not None:
+                node.visits += 1
+                if winner is None:
+                    node.reward += 0.5
+                elif winner == node.player:
+                    node.reward += 1.0
+                node = node.parent
+            done += 1
+
+        if not root.children:
+            return current_strategy(game)
+        return max(root.children,
+                   key=lambda move: root.children[move].visits)
+
+    return mcts_strategy
+
+
+# The Monte Carlo tree search strategy with the default budget.
+mcts_strategy = make_mcts_strategy()
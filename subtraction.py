@@ -0,0 +1,874 @@
+"""
+Subtraction games with any set of moves, solved with Sprague-Grundy values.
+
+A subtraction game is subtract square with another set of allowed moves:
+a finite set, squares, cubes, primes, or any predicate. The Grundy value
+of a position is 0 exactly when the player to move loses, and the Grundy
+value of a sum of games is the XOR of theirs.
+
+For a finite move set the Grundy values are eventually periodic, so once
+the period is found any value, however large, is answered in O(1).
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from typing import Sequence, Tuple
+from bisect import bisect_right
+from math import isqrt
+from games import GameCurrentState, SquareMoves, SSGameCurrentState
+from games import SubtractSquareGame
+from solvers import np
+
+# find_period gives up on finite move sets whose period has not shown
+# within this many values.
+PERIOD_SEARCH_LIMIT = 10 ** 6
+
+# The rolling hash find_period keeps of each window of Grundy values.
+_HASH_BASE = 1000003
+_HASH_MODULUS = (1 << 61) - 1
+
+
+def _iroot(value: int, power: int) -> int:
+    """
+    Return the largest k with k ** power <= value.
+    >>> _iroot(26, 3), _iroot(27, 3), _iroot(10 ** 18, 3)
+    (2, 3, 1000000)
+    """
+
+    if value < 1:
+        return 0
+    if power == 2:
+        return isqrt(value)
+
+    root = int(round(value ** (1 / power)))
+    while root ** power > value:
+        root -= 1
+    while (root + 1) ** power <= value:
+        root += 1
+    return root
+
+
+class MoveSet:
+    """
+    The amounts that may be subtracted in a subtraction game.
+    finite - whether there are finitely many moves
+    name - a short description of the moves
+    """
+    finite: bool = False
+    name: str = "moves"
+
+    def moves(self, value: int) -> Sequence[int]:
+        """
+        Return the moves no larger than value, in increasing order.
+        """
+
+        raise NotImplementedError
+
+    def __contains__(self, move: Any) -> bool:
+        """
+        Return whether move is in the move set.
+        """
+
+        raise NotImplementedError
+
+
+class FiniteMoveSet(MoveSet):
+    """
+    A finite set of moves, e.g. FiniteMoveSet([1, 3, 4]).
+    """
+    finite = True
+    _moves: List[int]
+
+    def __init__(self, moves: Iterable[int]) -> None:
+        """
+        Initialize the move set to moves.
+        >>> FiniteMoveSet([4, 1, 3, 1]).moves(3)
+        [1, 3]
+        """
+
+        self._moves = sorted(set(moves))
+        if not self._moves or self._moves[0] < 1:
+            raise ValueError("moves must be positive, and there must be one")
+        self.name = "{" + ", ".join(map(str, self._moves)) + "}"
+
+    @property
+    def largest(self) -> int:
+        """
+        The largest move.
+        """
+
+        return self._moves[-1]
+
+    def moves(self, value: int) -> List[int]:
+        """
+        Return the moves no larger than value, in increasing order.
+        """
+
+        return self._moves[:bisect_right(self._moves, value)]
+
+    def __contains__(self, move: Any) -> bool:
+        """
+        Return whether move is one of the moves.
+        >>> 3 in FiniteMoveSet([1, 3, 4]), 2 in FiniteMoveSet([1, 3, 4])
+        (True, False)
+        """
+
+        return move in self._moves
+
+
+class PowerMoveSet(MoveSet):
+    """
+    The positive k-th powers, e.g. squares (power 2) or cubes (power 3).
+    """
+    power: int
+
+    def __init__(self, power: int) -> None:
+        """
+        Initialize the move set to the positive powers of power.
+        >>> PowerMoveSet(3).moves(30)
+        [1, 8, 27]
+        >>> PowerMoveSet(2).moves(10)
+        [1, 4, 9]
+        """
+
+        self.power = power
+        self.name = {2: "squares", 3: "cubes"}.get(
+            power, "powers of {}".format(power))
+
+    def moves(self, value: int) -> Sequence[int]:
+        """
+        Return the powers no larger than value, in increasing order; a lazy
+        SquareMoves view for squares.
+        """
+
+        if self.power == 2:
+            return SquareMoves(value)
+        return [k ** self.power
+                for k in range(1, _iroot(value, self.power) + 1)]
+
+    def __contains__(self, move: Any) -> bool:
+        """
+        Return whether move is a positive power.
+        >>> 27 in PowerMoveSet(3), 9 in PowerMoveSet(3)
+        (True, False)
+        """
+
+        return (isinstance(move, int) and move > 0 and
+                _iroot(move, self.power) ** self.power == move)
+
+
+class PredicateMoveSet(MoveSet):
+    """
+    The positive integers for which predicate is true. Members found so
+    far are kept, so each integer is tested once.
+    """
+    predicate: Callable[[int], bool]
+    _members: List[int]
+    _checked: int
+
+    def __init__(self, predicate: Callable[[int], bool],
+                 name: str = "moves") -> None:
+        """
+        Initialize the move set to the integers satisfying predicate.
+        >>> PredicateMoveSet(lambda k: k % 3 == 0).moves(10)
+        [3, 6, 9]
+        """
+
+        self.predicate = predicate
+        self.name = name
+        self._members = []
+        self._checked = 0
+
+    def _extend(self, value: int) -> None:
+        """
+        Test every integer up to value.
+        """
+
+        for k in range(self._checked + 1, value + 1):
+            if self.predicate(k):
+                self._members.append(k)
+        self._checked = max(self._checked, value)
+
+    def moves(self, value: int) -> List[int]:
+        """
+        Return the members no larger than value, in increasing order,
+        testing the integers not tested yet.
+        """
+
+        self._extend(value)
+        return self._members[:bisect_right(self._members, value)]
+
+    def __contains__(self, move: Any) -> bool:
+        """
+        Return whether move is a positive integer satisfying the predicate.
+        """
+
+        return isinstance(move, int) and move > 0 and bool(
+            self.predicate(move))
+
+
+class PrimeMoveSet(PredicateMoveSet):
+    """
+    The primes, found with a sieve that doubles as larger values are needed.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the move set to the primes.
+        >>> PrimeMoveSet().moves(20)
+        [2, 3, 5, 7, 11, 13, 17, 19]
+        """
+
+        PredicateMoveSet.__init__(self, _is_prime, "primes")
+
+    def _extend(self, value: int) -> None:
+        if value <= self._checked:
+            return
+
+        size = max(value, 2 * self._checked, 64)
+        sieve = bytearray([1]) * (size + 1)
+        sieve[0:2] = b'\x00\x00'
+        for k in range(2, isqrt(size) + 1):
+            if sieve[k]:
+                sieve[k * k::k] = bytes(len(range(k * k, size + 1, k)))
+        self._members = [k for k in range(size + 1) if sieve[k]]
+        self._checked = size
+
+
+def _is_prime(k: int) -> bool:
+    """
+    Return whether k is prime.
+    >>> [k for k in range(12) if _is_prime(k)]
+    [2, 3, 5, 7, 11]
+    """
+
+    if k < 2:
+        return False
+    return all(k % d for d in range(2, isqrt(k) + 1))
+
+
+# grundy_values solves ranges of at most this many positions one position
+# at a time.
+_GRUNDY_BLOCK = 256
+
+# The move sets of the variants we offer, by name.
+MOVE_SETS = {'squares': lambda: PowerMoveSet(2),
+             'cubes': lambda: PowerMoveSet(3),
+             'primes': PrimeMoveSet}
+
+
+def _mex(values: Iterable[int]) -> int:
+    """
+    Return the smallest non-negative integer not in values.
+    >>> _mex([0, 1, 3])
+    2
+    """
+
+    seen = set(values)
+    result = 0
+    while result in seen:
+        result += 1
+    return result
+
+
+def grundy_values(move_set: MoveSet, n: int) -> Any:
+    """
+    Return the Grundy values of the positions 0 to n of the subtraction game
+    with move_set: a NumPy int array, or a list without NumPy.
+
+    Rather than taking a mex over every move of every position, positions
+    mark the positions they can be reached from with a bit for their Grundy
+    value; the mex of a position is then the lowest bit it does not have.
+    The marking is done by divide and conquer (see _grundy_range), so it
+    takes one NumPy step per move and range rather than one per position.
+    >>> [int(g) for g in grundy_values(FiniteMoveSet([1, 2]), 7)]
+    [0, 1, 2, 0, 1, 2, 0, 1]
+    >>> [int(g) for g in grundy_values(PowerMoveSet(2), 10)]
+    [0, 1, 0, 1, 2, 0, 1, 0, 1, 2, 0]
+    """
+
+    moves = list(move_set.moves(n))
+
+    if np is None:
+        values = []
+        for position in range(n + 1):
+            values.append(_mex(values[position - move] for move in moves
+                               if move <= position))
+        return values
+
+    values = np.zeros(n + 1, dtype=np.int32)
+    # reached[p] has bit v % 64 of word v // 64 set once a position of
+    # value v is a move below p; bits[p] has just the bit of the value of p
+    tables = [np.zeros((n + 1, 1), dtype=np.uint64),
+              np.zeros((n + 1, 1), dtype=np.uint64)]
+    # the positions inside a block each offset's moves reach
+    inside = moves[:bisect_right(moves, _GRUNDY_BLOCK)]
+    targets = [[offset + move for move in inside
+                if offset + move < _GRUNDY_BLOCK]
+               for offset in range(_GRUNDY_BLOCK)]
+    _grundy_range(values, tables, np.array(moves, dtype=np.int64), targets,
+                  0, n + 1)
+
+    return values
+
+
+def _grundy_range(values: Any, tables: List[Any], moves: Any,
+                  targets: List[List[int]], low: int, high: int) -> None:
+    """
+    Fill in values from low to high, given that every position below low
+    has already marked its bit in the reached table of tables.
+
+    The lower half is solved first; then, for each move shorter than the
+    range, the bits of the lower half are ORed onto the upper half in one
+    slice; then the upper half is solved. Every (position, move) pair is
+    marked exactly once, at the level where the two positions are split.
+    """
+
+    if high - low <= _GRUNDY_BLOCK:
+        _grundy_block(values, tables, targets, low, high)
+        return
+
+    mid = (low + high) // 2
+    _grundy_range(values, tables, moves, targets, low, mid)
+
+    reached, bits = tables
+    for move in moves[:int(np.searchsorted(moves, high - low))].tolist():
+        start = max(low, mid - move)
+        stop = min(mid, high - move)
+        reached[start + move:stop + move] |= bits[start:stop]
+
+    _grundy_range(values, tables, moves, targets, mid, high)
+
+
+def _grundy_block(values: Any, tables: List[Any], targets: List[List[int]],
+                  low: int, high: int) -> None:
+    """
+    Fill in values from low to high one position at a time, marking the
+    moves that stay inside the block as each value is found. Each position
+    works on its reached words joined into one Python int.
+    """
+
+    reached, bits = tables
+    size = high - low
+    width = 8 * reached.shape[1]
+    raw = reached[low:high].tobytes()
+    # marks past size only catch the moves that leave the block
+    marks = [int.from_bytes(raw[offset:offset + width], 'little')
+             for offset in range(0, size * width, width)]
+    marks += [0] * (_GRUNDY_BLOCK - size)
+
+    for offset in range(size):
+        mark = marks[offset]
+        value = (~mark & (mark + 1)).bit_length() - 1
+        marks[offset] = value
+        bit = 1 << value
+        for target in targets[offset]:
+            marks[target] |= bit
+
+    found = np.array(marks[:size], dtype=np.int64)
+    values[low:high] = found
+    if int(found.max()) >= 8 * width:
+        # a value needing another word: widen both tables
+        for table in range(2):
+            tables[table] = np.hstack(
+                [tables[table],
+                 np.zeros((len(tables[table]), 1), dtype=np.uint64)])
+        bits = tables[1]
+    bits[np.arange(low, high), found >> 6] = np.left_shift(
+        np.uint64(1), (found & 63).astype(np.uint64))
+
+
+class SubtractionEngine:
+    """
+    Answers Grundy values and best moves for a subtraction game.
+    move_set - the moves of the game
+    period - (start, length) once the values are known to repeat with that
+             period from start onwards, otherwise None
+    """
+    move_set: MoveSet
+    period: Optional[Tuple[int, int]]
+    _values: Any
+
+    def __init__(self, move_set: MoveSet) -> None:
+        """
+        Initialize an engine for the game with move_set.
+        """
+
+        self.move_set = move_set
+        self.period = None
+        self._values = []
+
+    def find_period(self, limit: int = PERIOD_SEARCH_LIMIT) \
+            -> Tuple[int, int]:
+        """
+        Find and return the (start, length) of the period of a finite move
+        set's Grundy values, searching at most limit values.
+
+        Once every move is possible, a value depends only on the previous
+        largest-move values, so the sequence repeats from the first window
+        of that length that occurs twice. Windows are remembered by a
+        rolling hash, so memory does not grow with the largest move, and a
+        window whose hash was seen is compared value by value before it is
+        trusted.
+        >>> SubtractionEngine(FiniteMoveSet([1, 3, 4])).find_period()
+        (0, 7)
+        >>> SubtractionEngine(FiniteMoveSet([1, 7, 2000])).find_period()
+        (0, 2007)
+        """
+
+        if self.period is not None:
+            return self.period
+        if not self.move_set.finite:
+            raise ValueError("only finite move sets are periodic")
+
+        moves = self.move_set.moves(limit)
+        width = self.move_set.largest
+        values: List[int] = []
+        # the hash of the window ending at each position, by the first
+        # such position
+        seen: Dict[int, int] = {}
+        window_hash = 0
+        oldest = pow(_HASH_BASE, width - 1, _HASH_MODULUS)
+
+        for position in range(limit + 1):
+            if position >= width:
+                earlier = seen.get(window_hash)
+                if earlier is not None and all(
+                        values[earlier - width + i] ==
+                        values[position - width + i] for i in range(width)):
+                    self.period = (earlier - width, position - earlier)
+                    self._values = values
+                    return self.period
+                if earlier is None:
+                    seen[window_hash] = position
+                # the window moves on: its oldest value leaves the hash
+                window_hash -= values[position - width] * oldest
+            value = _mex(values[position - move] for move in moves
+                         if move <= position)
+            values.append(value)
+            window_hash = (window_hash * _HASH_BASE + value) % _HASH_MODULUS
+
+        raise ValueError("no period within {} values".format(limit))
+
+    def grundy(self, value: int) -> int:
+        """
+        Return the Grundy value of the position value. Finite move sets
+        answer in O(1) once their period is found; other sets tabulate up
+        to value, doubling the table each time it grows.
+        >>> SubtractionEngine(FiniteMoveSet([1, 3, 4])).grundy(10 ** 18 + 4)
+        3
+        >>> SubtractionEngine(PrimeMoveSet()).grundy(8)
+        4
+        """
+
+        if self.move_set.finite:
+            start, length = self.find_period()
+            if value >= start:
+                value = start + (value - start) % length
+            return int(self._values[value])
+
+        if value >= len(self._values):
+            size = max(value, 2 * len(self._values), 64)
+            self._values = grundy_values(self.move_set, size)
+        return int(self._values[value])
+
+    def is_winning(self, value: int) -> bool:
+        """
+        Return whether the player to move wins from value.
+        """
+
+        return self.grundy(value) != 0
+
+    def best_move(self, value: int) -> Optional[int]:
+        """
+        Return the smallest move to a losing position, or None if value is
+        a loss itself.
+        >>> SubtractionEngine(FiniteMoveSet([1, 3, 4])).best_move(10 ** 18 + 4)
+        3
+        """
+
+        if not self.is_winning(value):
+            return None
+        for move in self.move_set.moves(value):
+            if self.grundy(value - move) == 0:
+                return move
+        return None
+
+
+class SubtractionGameCurrentState(SSGameCurrentState):
+    """
+    Keeps track of a subtraction game being played.
+    move_set - the moves of the game
+    """
+    move_set: MoveSet
+
+    def __init__(self, is_p1_turn: bool, current_val: Any,
+                 move_set: MoveSet) -> None:
+        """
+        Initialize the current game state of a game with move_set.
+        >>> state = SubtractionGameCurrentState(True, 10, PowerMoveSet(3))
+        >>> state.get_possible_moves()
+        [1, 8]
+        """
+
+        self.move_set = move_set
+        SSGameCurrentState.__init__(self, is_p1_turn, current_val)
+
+    def get_possible_moves(self) -> Sequence[int]:
+        """
+        Return the possible moves, given the current game state.
+        """
+
+        return self.move_set.moves(self.current_val)
+
+    def is_valid_move(self, move_to_make: Any) -> bool:
+        """
+        Return whether move_to_make is legal given the current game state.
+        >>> state = SubtractionGameCurrentState(True, 10, PrimeMoveSet())
+        >>> state.is_valid_move(7), state.is_valid_move(9)
+        (True, False)
+        """
+
+        return (move_to_make in self.move_set and
+                move_to_make <= self.current_val)
+
+    def make_move(self, move_to_make: int) -> 'SubtractionGameCurrentState':
+        """
+        The current value is changed according to move_to_make.
+        >>> state = SubtractionGameCurrentState(True, 10, PrimeMoveSet())
+        >>> print(state.make_move(7))
+        p2's turn to move; the current value is 3.
+        """
+
+        state = type(self).__new__(type(self))
+        state.move_set = self.move_set
+        state.compact = self.compact.make_move(move_to_make)
+        state.possible_moves_list = state.get_possible_moves()
+
+        return state
+
+
+class SubtractionGame(SubtractSquareGame):
+    """
+    Subtract square with any set of moves; see MoveSet.
+    """
+    move_set: MoveSet
+    engine: SubtractionEngine
+
+    def __init__(self, is_p1_turn: bool, move_set: MoveSet,
+                 starting_num: Any = None) -> None:
+        """
+        Initialize the subtraction game with move_set;
+        set which player (1 or 2) should move first.
+        >>> game = SubtractionGame(True, FiniteMoveSet([1, 2]), 9)
+        >>> game.engine.best_move(game.current_state.current_val) is None
+        True
+        """
+
+        self.is_p1_turn = is_p1_turn
+        self.move_set = move_set
+        self.engine = SubtractionEngine(move_set)
+        if starting_num is None:
+            starting_num = self.initial_input()
+        self.current_state = SubtractionGameCurrentState(
+            is_p1_turn, int(starting_num), move_set)
+
+    def __str__(self) -> str:
+        """
+        Return a user-friendly string representation of SubtractionGame.
+        >>> print(SubtractionGame(True, PrimeMoveSet(), 4))
+        This is a subtraction game with primes, and it's p1's turn to move.
+        """
+
+        return ("This is a subtraction game with {}, "
+                "and it's {}'s turn to move.".format(
+                    self.move_set.name,
+                    'p1' if self.is_p1_turn else 'p2'))
+
+    def get_instructions(self) -> str:
+        """
+        Provides the instructions for the subtraction game.
+        """
+
+        return (self.Game_Description_SS.replace("square", "number")
+                + " The numbers that may be subtracted are the {}.".format(
+                    self.move_set.name))
+
+
+# Grundy values of subtract square, shared by every multi-heap game.
+SQUARE_ENGINE = SubtractionEngine(PowerMoveSet(2))
+
+
+class HeapMoves(Sequence):
+    """
+    The moves of a multi-heap subtract square position: (heap, square)
+    pairs, heaps numbered from 1, in order of heap and then square. Like
+    SquareMoves, the pairs are never all built.
+    heaps - the heap sizes
+    """
+    __slots__ = ('heaps', '_ends')
+    heaps: Tuple[int, ...]
+    _ends: List[int]
+
+    def __init__(self, heaps: Sequence[int]) -> None:
+        """
+        Initialize the moves available from heaps.
+        >>> HeapMoves((2, 0, 4))
+        [(1, 1), (3, 1), (3, 4)]
+        >>> len(HeapMoves((10 ** 6,) * 36))
+        36000
+        """
+
+        self.heaps = tuple(heaps)
+        # _ends[i] is the number of moves in the heaps up to heap i + 1
+        self._ends = []
+        total = 0
+        for heap in self.heaps:
+            total += isqrt(heap) if heap > 0 else 0
+            self._ends.append(total)
+
+    def __len__(self) -> int:
+        """
+        Return the number of moves, from the root counts of the heaps.
+        >>> len(HeapMoves((5, 9)))
+        5
+        """
+
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, index: Any) -> Any:
+        """
+        Return the move at index, or a list of the moves in a slice.
+        >>> HeapMoves((5, 9))[2:]
+        [(2, 1), (2, 4), (2, 9)]
+        """
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("move index out of range")
+
+        heap = bisect_right(self._ends, index)
+        root = index - (self._ends[heap - 1] if heap else 0) + 1
+        return heap + 1, root * root
+
+    def __contains__(self, move: Any) -> bool:
+        """
+        Return whether move subtracts a square from a heap at least as big.
+        >>> (2, 9) in HeapMoves((5, 9)), (1, 9) in HeapMoves((5, 9))
+        (True, False)
+        >>> 9 in HeapMoves((5, 9))
+        False
+        """
+
+        if not isinstance(move, tuple) or len(move) != 2:
+            return False
+        heap, square = move
+        return (isinstance(heap, int) and 1 <= heap <= len(self.heaps) and
+                square in SquareMoves(self.heaps[heap - 1]))
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        """
+        Yield the moves in order of heap and then square.
+        >>> list(HeapMoves((2, 4)))
+        [(1, 1), (2, 1), (2, 4)]
+        """
+
+        for heap, size in enumerate(self.heaps, 1):
+            for square in SquareMoves(size):
+                yield heap, square
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether self lists the same moves as other, which may also be
+        a list or tuple of moves.
+        >>> HeapMoves((0, 0)) == []
+        True
+        """
+
+        if isinstance(other, (HeapMoves, list, tuple)):
+            return (len(self) == len(other) and
+                    all(a == b for a, b in zip(self, other)))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        """
+        Return the moves written out as a list.
+        """
+
+        return repr(list(self))
+
+    __hash__ = None
+
+
+class MultiHeapState(GameCurrentState):
+    """
+    Keeps track of a multi-heap subtract square game being played.
+    heaps - the heap sizes
+    """
+    heaps: Tuple[int, ...]
+    possible_moves_list: HeapMoves
+
+    def __init__(self, is_p1_turn: bool, heaps: Sequence[int]) -> None:
+        """
+        Initialize the current game state with heaps.
+        >>> MultiHeapState(True, [3, 4]).get_possible_moves()
+        [(1, 1), (2, 1), (2, 4)]
+        """
+
+        GameCurrentState.__init__(self, is_p1_turn)
+        self.heaps = tuple(int(heap) for heap in heaps)
+        self.possible_moves_list = self.get_possible_moves()
+
+    __hash__ = GameCurrentState.__hash__
+
+    @property
+    def key(self) -> Tuple[Tuple[int, ...], bool]:
+        """
+        The heaps and the player to move.
+        """
+
+        return self.heaps, self.is_p1_turn
+
+    def __str__(self) -> str:
+        """
+        Return a user-friendly string representation of MultiHeapState.
+        >>> print(MultiHeapState(False, [3, 4]))
+        p2's turn to move; the heaps are 3, 4.
+        """
+
+        return "{}'s turn to move; the heaps are {}.".format(
+            self.get_current_player_name(), ", ".join(map(str, self.heaps)))
+
+    def get_possible_moves(self) -> HeapMoves:
+        """
+        Return the possible moves, given the current game state.
+        """
+
+        return HeapMoves(self.heaps)
+
+    def is_valid_move(self, move_to_make: Any) -> bool:
+        """
+        Return whether move_to_make is legal given the current game state.
+        >>> MultiHeapState(True, [3, 4]).is_valid_move((2, 4))
+        True
+        """
+
+        return move_to_make in self.possible_moves_list
+
+    def make_move(self, move_to_make: Tuple[int, int]) -> 'MultiHeapState':
+        """
+        Subtract the square of move_to_make from its heap.
+        >>> print(MultiHeapState(True, [3, 4]).make_move((2, 4)))
+        p2's turn to move; the heaps are 3, 0.
+        """
+
+        heap, square = move_to_make
+        heaps = list(self.heaps)
+        heaps[heap - 1] -= square
+
+        return MultiHeapState(not self.is_p1_turn, heaps)
+
+
+def heaps_best_move(heaps: Sequence[int]) -> Optional[Tuple[int, int]]:
+    """
+    Return a winning (heap, square) move from heaps, or None if the player
+    to move loses.
+
+    The heaps are a sum of subtract square games, so the position is lost
+    exactly when the XOR (nim-sum) of their Grundy values is 0; a winning
+    move takes one heap to the Grundy value that makes the nim-sum 0.
+    The Grundy values are tabulated once, up to the largest heap seen, and
+    shared by every game; after that a move costs one pass over the squares
+    of a single heap.
+    >>> heaps_best_move([5, 20]) is None
+    True
+    >>> heaps_best_move([6] + [10 ** 5] * 36)
+    (1, 1)
+    """
+
+    # tabulate once up to the largest heap rather than growing per heap
+    SQUARE_ENGINE.grundy(max(heaps, default=0))
+    grundy = [SQUARE_ENGINE.grundy(heap) for heap in heaps]
+    nim_sum = 0
+    for value in grundy:
+        nim_sum ^= value
+    if nim_sum == 0:
+        return None
+
+    for heap, value in enumerate(grundy):
+        target = value ^ nim_sum
+        if target < value:
+            for square in SquareMoves(heaps[heap]):
+                if SQUARE_ENGINE.grundy(heaps[heap] - square) == target:
+                    return heap + 1, square
+
+    return None
+
+
+class MultiHeapSubtractSquareGame(SubtractSquareGame):
+    """
+    Subtract square with several heaps: each move subtracts a square from
+    one heap, and the player left without a move loses.
+    """
+    current_state: MultiHeapState
+
+    def __init__(self, is_p1_turn: bool, heaps: Any = None) -> None:
+        """
+        Initialize the game with heaps, a sequence of heap sizes, a single
+        heap size, or a string of sizes separated by spaces; the player is
+        asked for them if they are not given.
+        >>> print(MultiHeapSubtractSquareGame(True, "3 10 0").current_state)
+        p1's turn to move; the heaps are 3, 10, 0.
+        """
+
+        self.is_p1_turn = is_p1_turn
+        if heaps is None:
+            heaps = self.initial_input()
+        if isinstance(heaps, str):
+            heaps = heaps.replace(',', ' ').split()
+        elif isinstance(heaps, int):
+            heaps = [heaps]
+        self.current_state = MultiHeapState(is_p1_turn, heaps)
+
+    def __str__(self) -> str:
+        """
+        Return a user-friendly string representation of the game.
+        """
+
+        return ("This is a multi-heap subtract square game, "
+                "and it's {}'s turn to move.".format(
+                    'p1' if self.is_p1_turn else 'p2'))
+
+    def get_instructions(self) -> str:
+        """
+        Provides the instructions for multi-heap subtract square.
+        """
+
+        return ("Subtract square played on several heaps at once: each "
+                "move subtracts a square from one heap, entered as the heap "
+                "number and the square, e.g. '2 9'. Whoever is about to "
+                "play when every heap is 0 loses!")
+
+    def str_to_move(self, move: str) -> Any:
+        """
+        Converts a move typed as "heap square" into a (heap, square) pair;
+        anything else is returned unchanged, and is not a valid move.
+        >>> game = MultiHeapSubtractSquareGame(True, [5, 9])
+        >>> game.str_to_move("2 9"), game.str_to_move("(1, 4)")
+        ((2, 9), (1, 4))
+        """
+
+        parts = move.strip().strip('()').replace(',', ' ').split()
+        try:
+            heap, square = (int(part) for part in parts)
+        except ValueError:
+            return move
+        return heap, square
+
+    def initial_input(self) -> str:
+        """
+        Request the player for the starting heaps.
+        """
+
+        return input("Choose the starting heaps, separated by spaces: ")
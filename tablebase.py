@@ -0,0 +1,267 @@
+"""
+A persistent subtract square tablebase, memory-mapped read-only so every
+process that opens the same file shares one copy of it in the page cache.
+
+File layout (little-endian):
+    header - 4-byte magic b'SSTB', uint16 version, uint16 flags,
+             uint64 count of values stored (0 to count - 1), 16 bytes spare
+    body   - without FLAG_MOVES: one bit per value, set if the player to
+             move wins (value v is bit v % 8 of byte v // 8)
+           - with FLAG_MOVES: one uint32 per value, the square root of the
+             smallest winning move, or 0 if the value is a loss
+
+Values are only ever appended, so a reader's mapping stays valid while
+another process extends the file.
+"""
+from typing import Any, Optional
+from math import isqrt
+import mmap
+import os
+import struct
+from solvers import np, SS_TABLE_LIMIT, extend_subtract_square
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b'SSTB'
+VERSION = 1
+
+# Set in the header's flags when the tablebase stores best moves.
+FLAG_MOVES = 1
+
+_HEADER = struct.Struct('<4sHHQ16x')
+_MOVE = struct.Struct('<I')
+
+
+class SSTablebase:
+    """
+    A subtract square tablebase file.
+    path - the file holding the tablebase
+    with_moves - whether the best move of every value is stored
+    count - the number of values stored (0 to count - 1)
+    """
+    path: str
+    with_moves: bool
+    count: int
+    _map: Any
+
+    def __init__(self, path: str, with_moves: bool = False) -> None:
+        """
+        Open the tablebase at path, creating an empty one if there is
+        none. with_moves only matters when the file is created.
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'ss.tb')
+        >>> tablebase = SSTablebase(path, with_moves=True)
+        >>> tablebase.is_winning(20), tablebase.best_move(21)
+        (False, 1)
+        >>> SSTablebase(path).best_move(6)
+        1
+        """
+
+        self.path = path
+        self._map = None
+        self.count = 0
+
+        if not os.path.exists(path):
+            flags = FLAG_MOVES if with_moves else 0
+            with open(path, 'xb') as new_file:
+                new_file.write(_HEADER.pack(MAGIC, VERSION, flags, 0))
+
+        self._remap()
+
+    def _remap(self) -> None:
+        """
+        Map the file again, picking up values appended since the last map.
+        """
+
+        with open(self.path, 'rb') as table_file:
+            magic, version, flags, count = _HEADER.unpack(
+                table_file.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("{} is not a subtract square tablebase"
+                                 .format(self.path))
+            self.with_moves = bool(flags & FLAG_MOVES)
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(table_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self.count = count
+
+    def close(self) -> None:
+        """
+        Unmap the tablebase.
+        """
+
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def ensure(self, value: int) -> None:
+        """
+        Make sure value is stored, extending the file if it is not.
+        The file grows at least twofold each time, to keep extensions rare.
+        """
+
+        if value < self.count:
+            return
+
+        # another process may have extended the file already
+        self._remap()
+        if value < self.count:
+            return
+
+        with open(self.path, 'r+b') as table_file:
+            if fcntl is not None:
+                fcntl.flock(table_file, fcntl.LOCK_EX)
+            try:
+                self._remap()
+                if value >= self.count:
+                    target = max(value, min(2 * self.count, SS_TABLE_LIMIT),
+                                 1023)
+                    self._extend(table_file, target)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(table_file, fcntl.LOCK_UN)
+
+        self._remap()
+
+    def _extend(self, table_file: Any, n: int) -> None:
+        """
+        Append the values from count to n to table_file, then update the
+        header. The file must be locked by the caller.
+        """
+
+        old_count = self.count
+        win = extend_subtract_square(self._win_table(), n)
+
+        if self.with_moves:
+            table_file.seek(_HEADER.size + old_count * _MOVE.size)
+            table_file.write(_pack_roots(win, old_count))
+        else:
+            # the last partial byte is rewritten along with the new values
+            first_byte = old_count // 8
+            table_file.seek(_HEADER.size + first_byte)
+            table_file.write(_pack_bits(win, first_byte * 8))
+
+        table_file.flush()
+        os.fsync(table_file.fileno())
+
+        # readers only trust the new values once the header says so
+        table_file.seek(0)
+        table_file.write(_HEADER.pack(MAGIC, VERSION,
+                                      FLAG_MOVES if self.with_moves else 0,
+                                      n + 1))
+        table_file.flush()
+
+    def _win_table(self) -> Any:
+        """
+        Return the stored values as a table for extend_subtract_square.
+        """
+
+        if self.with_moves:
+            if np is not None:
+                roots = np.frombuffer(self._map, dtype='<u4',
+                                      count=self.count, offset=_HEADER.size)
+                return roots != 0
+            return bytearray(self.root(v) != 0 for v in range(self.count))
+
+        body = self._map[_HEADER.size:_HEADER.size + (self.count + 7) // 8]
+        if np is not None:
+            bits = np.unpackbits(np.frombuffer(body, dtype=np.uint8),
+                                 bitorder='little')
+            return bits[:self.count].astype(bool)
+        return bytearray((body[v >> 3] >> (v & 7)) & 1
+                         for v in range(self.count))
+
+    def root(self, value: int) -> int:
+        """
+        Return the stored root of value's best move (0 for a loss).
+        Only tablebases with moves store roots.
+        """
+
+        return _MOVE.unpack_from(self._map,
+                                 _HEADER.size + value * _MOVE.size)[0]
+
+    def is_winning(self, value: int) -> bool:
+        """
+        Return whether the player to move wins from value.
+        """
+
+        self.ensure(value)
+        if self.with_moves:
+            return self.root(value) != 0
+        return bool((self._map[_HEADER.size + (value >> 3)] >> (value & 7))
+                    & 1)
+
+    def best_move(self, value: int) -> Optional[int]:
+        """
+        Return the smallest square that leaves the opponent at a losing
+        value, or None if value is a loss.
+        """
+
+        self.ensure(value)
+        if self.with_moves:
+            root = self.root(value)
+        elif not self.is_winning(value):
+            root = 0
+        else:
+            root = next(k for k in range(1, isqrt(value) + 1)
+                        if not self.is_winning(value - k * k))
+
+        return root * root if root else None
+
+
+def _pack_bits(win: Any, start: int) -> bytes:
+    """
+    Return the bits of win from start (a multiple of 8) onwards, packed
+    eight values to a byte.
+    >>> _pack_bits(bytearray([1, 0, 0, 0, 0, 0, 0, 0, 1]), 0)
+    b'\\x01\\x01'
+    """
+
+    if np is not None and not isinstance(win, bytearray):
+        return np.packbits(win[start:], bitorder='little').tobytes()
+
+    packed = bytearray((len(win) - start + 7) // 8)
+    for v in range(start, len(win)):
+        if win[v]:
+            packed[(v - start) >> 3] |= 1 << (v & 7)
+    return bytes(packed)
+
+
+def _pack_roots(win: Any, start: int) -> bytes:
+    """
+    Return the root of the smallest winning move of every value of win from
+    start onwards (0 for a loss), as little-endian uint32s.
+    >>> from solvers import solve_subtract_square
+    >>> list(struct.unpack('<4I', _pack_roots(solve_subtract_square(8), 5)))
+    [0, 1, 0, 1]
+    """
+
+    if np is None or isinstance(win, bytearray):
+        roots = []
+        for v in range(start, len(win)):
+            root = 0
+            if win[v]:
+                root = next(k for k in range(1, isqrt(v) + 1)
+                            if not win[v - k * k])
+            roots.append(root)
+        return struct.pack('<{}I'.format(len(roots)), *roots)
+
+    n = len(win) - 1
+    roots = np.zeros(n + 1 - start, dtype='<u4')
+
+    # every loss p gives each p + k * k the winning move k; the largest
+    # such p gives the smallest k, so later losses overwrite earlier ones
+    for loss in np.flatnonzero(~win).tolist():
+        low = 1
+        if loss < start:
+            low = isqrt(start - loss - 1) + 1
+        high = isqrt(n - loss)
+        if low <= high:
+            ks = np.arange(low, high + 1, dtype=np.int64)
+            roots[loss + ks * ks - start] = ks
+
+    return roots.tobytes()
@@ -0,0 +1,357 @@
+"""
+Play a round-robin tournament between strategies and rate them.
+
+Every pair of strategies plays the given number of games of each game type,
+taking turns to move first. Each game is written to a JSON-lines results
+file as soon as it is finished, e.g.
+    python tournament.py --games 100 --strategies r m --results games.jsonl
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import combinations
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from game_interface import playable_games, usable_strategies
+from simulate import DEFAULT_START, MAX_MOVES, new_game, play_game
+
+# The rating given to the average strategy.
+BASE_ELO = 1500
+
+# z-score of the 95% confidence intervals.
+CONFIDENCE_Z = 1.96
+
+# Iterations of the Bradley-Terry rating fit.
+_RATING_ROUNDS = 100
+
+
+def _play_pairing(game_key: str, p1_key: str, p2_key: str, first_game: int,
+                  games: int, start: int, max_moves: int,
+                  seed: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    Play games first_game to first_game + games - 1 of a pairing and return
+    one record per game. p1 moves first in the even-numbered games.
+    Runs in a worker process.
+    """
+
+    if seed is not None:
+        random.seed("{}-{}-{}-{}-{}".format(seed, game_key, p1_key, p2_key,
+                                            first_game))
+
+    p1_strategy = usable_strategies[p1_key]
+    p2_strategy = usable_strategies[p2_key]
+    records = []
+
+    for number in range(first_game, first_game + games):
+        is_p1_turn = number % 2 == 0
+        game = new_game(game_key, is_p1_turn, start)
+        winner, moves = play_game(game, p1_strategy, p2_strategy, max_moves)
+        records.append({'game': game_key,
+                        'number': number,
+                        'p1': p1_key,
+                        'p2': p2_key,
+                        'first': 'p1' if is_p1_turn else 'p2',
+                        'winner': {'p1': p1_key, 'p2': p2_key}.get(winner),
+                        'moves': moves})
+
+    return records
+
+
+class Standings:
+    """
+    The running results of a tournament for one game type.
+    players - the strategies taking part
+    wins, losses, draws - game counts of each strategy
+    scores - points scored by each strategy against each opponent
+             (1 per win, 0.5 per draw), by (strategy, opponent)
+    games - games played between each pair, by (strategy, opponent)
+    """
+    players: List[str]
+    wins: Dict[str, int]
+    losses: Dict[str, int]
+    draws: Dict[str, int]
+    scores: Dict[Tuple[str, str], float]
+    games: Dict[Tuple[str, str], int]
+
+    def __init__(self, players: List[str]) -> None:
+        """
+        Initialize empty standings for players.
+        """
+
+        self.players = list(players)
+        self.wins = {player: 0 for player in players}
+        self.losses = {player: 0 for player in players}
+        self.draws = {player: 0 for player in players}
+        self.scores = {}
+        self.games = {}
+
+    def add_game(self, record: Dict[str, Any]) -> None:
+        """
+        Add the result of one game, as returned by _play_pairing.
+        >>> standings = Standings(['r', 'm'])
+        >>> standings.add_game({'p1': 'r', 'p2': 'm', 'winner': 'm'})
+        >>> standings.wins['m'], standings.losses['r']
+        (1, 1)
+        """
+
+        first, second = record['p1'], record['p2']
+        for player, opponent in ((first, second), (second, first)):
+            self.games[player, opponent] = (
+                self.games.get((player, opponent), 0) + 1)
+            if record['winner'] is None:
+                self.draws[player] += 1
+                points = 0.5
+            elif record['winner'] == player:
+                self.wins[player] += 1
+                points = 1.0
+            else:
+                self.losses[player] += 1
+                points = 0.0
+            self.scores[player, opponent] = (
+                self.scores.get((player, opponent), 0.0) + points)
+
+    def played(self, player: str) -> int:
+        """
+        Return the number of games player has played.
+        """
+
+        return self.wins[player] + self.losses[player] + self.draws[player]
+
+    def _score(self, player: str) -> float:
+        """
+        Return the points player has scored.
+        """
+
+        return self.wins[player] + 0.5 * self.draws[player]
+
+    def ratings(self) -> Dict[str, Tuple[float, float, float]]:
+        """
+        Return each player's Elo rating with the low and high ends of its
+        95% confidence interval.
+
+        Ratings are the Bradley-Terry strengths that best explain the
+        scores between each pair, fitted by minorization-maximization and
+        put on the Elo scale around BASE_ELO. Scores get half a point of
+        smoothing, so a strategy that wins every game still has a finite
+        rating. The interval widens the rating by the Wilson interval of
+        the player's overall score rate.
+        >>> standings = Standings(['r', 'm'])
+        >>> for _ in range(10):
+        ...     standings.add_game({'p1': 'r', 'p2': 'm', 'winner': 'm'})
+        >>> ratings = standings.ratings()
+        >>> ratings['m'][0] > BASE_ELO > ratings['r'][0]
+        True
+        >>> ratings['m'][1] < ratings['m'][0] < ratings['m'][2]
+        True
+        """
+
+        active = [player for player in self.players if self.played(player)]
+        strengths = {player: 1.0 for player in active}
+
+        for _ in range(_RATING_ROUNDS):
+            new_strengths = {}
+            for player in active:
+                expected = sum(
+                    self.games.get((player, opponent), 0) /
+                    (strengths[player] + strengths[opponent])
+                    for opponent in active if opponent != player)
+                new_strengths[player] = (self._score(player) + 0.5) / expected
+            total = sum(new_strengths.values())
+            strengths = {player: len(active) * strength / total
+                         for player, strength in new_strengths.items()}
+
+        # centre the ratings so the average strategy sits at BASE_ELO
+        elos = {player: 400 * math.log10(strength)
+                for player, strength in strengths.items()}
+        centre = sum(elos.values()) / len(elos) if elos else 0.0
+
+        result = {}
+        for player in self.players:
+            played = self.played(player)
+            if not played:
+                result[player] = (BASE_ELO, -math.inf, math.inf)
+                continue
+            elo = BASE_ELO + elos[player] - centre
+            rate = (self._score(player) + 0.5) / (played + 1)
+            low, high = _wilson_interval(self._score(player), played)
+            result[player] = (elo,
+                              elo + _elo_difference(low)
+                              - _elo_difference(rate),
+                              elo + _elo_difference(high)
+                              - _elo_difference(rate))
+
+        return result
+
+    def table(self) -> str:
+        """
+        Return the standings as a text table, best rated first.
+        """
+
+        ratings = self.ratings()
+        lines = ["{:<10}{:>7}{:>7}{:>7}{:>7}{:>9}{:>8}{:>18}".format(
+            "strategy", "games", "wins", "losses", "draws", "win %",
+            "elo", "95% interval")]
+        for player in sorted(self.players, key=lambda p: -ratings[p][0]):
+            played = self.played(player)
+            elo, low, high = ratings[player]
+            lines.append(
+                "{:<10}{:>7}{:>7}{:>7}{:>7}{:>8.1f}%{:>8.0f}{:>9.0f} to "
+                "{:>5.0f}".format(
+                    usable_strategies[player].__name__[:9], played,
+                    self.wins[player], self.losses[player],
+                    self.draws[player],
+                    100 * self.wins[player] / played if played else 0.0,
+                    elo, low, high))
+
+        return "\n".join(lines)
+
+
+def _elo_difference(rate: float) -> float:
+    """
+    Return the rating difference at which the expected score rate is rate.
+    >>> _elo_difference(0.5)
+    0.0
+    >>> round(_elo_difference(0.75))
+    191
+    """
+
+    rate = min(max(rate, 1e-6), 1 - 1e-6)
+    return 400 * math.log10(rate / (1 - rate))
+
+
+def _wilson_interval(score: float, games: int) -> Tuple[float, float]:
+    """
+    Return the 95% Wilson score interval of score points out of games.
+    >>> low, high = _wilson_interval(50, 100)
+    >>> round(low, 3), round(high, 3)
+    (0.404, 0.596)
+    """
+
+    z = CONFIDENCE_Z
+    rate = score / games
+    centre = rate + z * z / (2 * games)
+    spread = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games ** 2))
+    denominator = 1 + z * z / games
+
+    return (centre - spread) / denominator, (centre + spread) / denominator
+
+
+def _pairing_batches(game_keys: List[str], players: List[str], games: int,
+                     batch_size: int, start: int, max_moves: int,
+                     seed: Optional[int]) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yield the arguments of every _play_pairing batch of the tournament.
+    """
+
+    for game_key in game_keys:
+        for p1_key, p2_key in combinations(players, 2):
+            for number in range(0, games, batch_size):
+                yield (game_key, p1_key, p2_key, number,
+                       min(batch_size, games - number), start, max_moves,
+                       seed)
+
+
+def run_tournament(players: List[str], game_keys: List[str], games: int,
+                   results_file: Any = None, start: int = DEFAULT_START,
+                   max_moves: int = MAX_MOVES, workers: Optional[int] = None,
+                   batch_size: int = 50,
+                   seed: Optional[int] = None) -> Dict[str, Standings]:
+    """
+    Play games games of each game type in game_keys between every pair of
+    players (keys of usable_strategies) and return the standings of each
+    game type.
+
+    Each game is written to results_file as a JSON line as soon as its
+    batch finishes. At most two batches per worker are queued at once, so
+    memory does not grow with the size of the tournament.
+    >>> standings = run_tournament(['r', 'm'], ['s'], 4, start=20, workers=1)
+    >>> standings['s'].wins['m'] + standings['s'].wins['r']
+    4
+    """
+
+    standings = {game_key: Standings(players) for game_key in game_keys}
+    batches = _pairing_batches(game_keys, players, games, batch_size, start,
+                               max_moves, seed)
+
+    def record(records: List[Dict[str, Any]]) -> None:
+        for game in records:
+            standings[game['game']].add_game(game)
+            if results_file is not None:
+                results_file.write(json.dumps(game) + "\n")
+        if results_file is not None:
+            results_file.flush()
+
+    if workers == 1:
+        for batch in batches:
+            record(_play_pairing(*batch))
+        return standings
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(_play_pairing, *batch))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future.result())
+        for future in pending:
+            record(future.result())
+
+    return standings
+
+
+def main() -> None:
+    """
+    Run a tournament from the command line and print its standings.
+    """
+
+    computer_strategies = [key for key in usable_strategies
+                           if key != 'i' and usable_strategies[key]]
+    parser = argparse.ArgumentParser(
+        description="Play a round-robin tournament between strategies.")
+    parser.add_argument('--strategies', nargs='+', choices=computer_strategies,
+                        default=computer_strategies)
+    parser.add_argument('--game-types', nargs='+',
+                        choices=sorted(playable_games),
+                        default=sorted(playable_games))
+    parser.add_argument('--games', type=int, default=100,
+                        help="games per pairing and game type")
+    parser.add_argument('--start', type=int, default=DEFAULT_START,
+                        help="starting value for subtract square")
+    parser.add_argument('--max-moves', type=int, default=MAX_MOVES)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--results', help="JSON-lines file for every game "
+                                          "(default: do not keep games)")
+    args = parser.parse_args()
+
+    results_file = None
+    if args.results == '-':
+        results_file = sys.stdout
+    elif args.results:
+        results_file = open(args.results, 'w')
+
+    try:
+        standings = run_tournament(args.strategies, args.game_types,
+                                   args.games, results_file,
+                                   start=args.start,
+                                   max_moves=args.max_moves,
+                                   workers=args.workers,
+                                   batch_size=args.batch_size,
+                                   seed=args.seed)
+    finally:
+        if results_file not in (None, sys.stdout):
+            results_file.close()
+
+    for game_key in args.game_types:
+        print("\n{}:".format(playable_games[game_key].__name__))
+        print(standings[game_key].table())
+
+
+if __name__ == '__main__':
+    main()